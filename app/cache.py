@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from app.metrics import CACHE_REQUESTS
+
+
+# Bounded in-process cache, entries expire after their TTL and the least recently used entry is dropped when full
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float, name: str):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._hit_counter = CACHE_REQUESTS.labels(name, "hit")
+        self._miss_counter = CACHE_REQUESTS.labels(name, "miss")
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] <= now:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                self._miss_counter.inc()
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            self._hit_counter.inc()
+            return item[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    # Drop every entry whose value matches, returns how many were dropped
+    def evict_where(self, predicate: Callable[[Any], bool]) -> int:
+        with self._lock:
+            keys = [key for key, (_, value) in self._data.items() if predicate(value)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
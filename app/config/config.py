@@ -1,3 +1,5 @@
+from typing import List, Optional
+
 from pydantic_settings import BaseSettings
 
 
@@ -12,11 +14,65 @@ class Settings(BaseSettings):
     SQL_DATABASE: str
     SQL_USER: str
     SQL_PASSWORD: str
+    # Overrides the MySQL settings above when set, must use an async driver (e.g. sqlite+aiosqlite:///./fas.db)
+    DATABASE_URL: Optional[str] = None
+
+    # SQL connection pool
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800  # seconds, keep below MySQL's wait_timeout
+    DB_POOL_PRE_PING: bool = True
+    # Read replicas for the read-heavy endpoints, as a JSON list of async URLs; empty sends every query to the primary.
+    # A replica whose connections fail is skipped for READ_REPLICA_EJECT_SECONDS.
+    READ_REPLICA_URLS: List[str] = []
+    READ_REPLICA_EJECT_SECONDS: float = 30
 
     # JWT
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_DAYS: int
+    # Resolved administrators are cached per token, a deactivated admin is locked out after at most the TTL
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    AUTH_CACHE_MAX_SIZE: int = 10000
+    # bcrypt runs on a dedicated thread pool, requests beyond workers + queue are rejected with 503
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+
+    # Pagination
+    DEFAULT_PAGE_SIZE: int = 100
+    MAX_PAGE_SIZE: int = 1000
+
+    # GET /api/schemes is served from memory, other workers see a new scheme after at most the TTL
+    SCHEME_CATALOG_TTL_SECONDS: int = 300
+    # Eligibility read while a refresh is queued sees schemes created by other workers after at most this long
+    SCHEME_INDEX_CHECK_SECONDS: float = 5
+    # Materialized eligibility is refreshed by a background task started on first use in each worker, entries per transaction
+    ELIGIBILITY_REFRESH_ENABLED: bool = True
+    ELIGIBILITY_REFRESH_INTERVAL_SECONDS: float = 1.0
+    ELIGIBILITY_REFRESH_BATCH_SIZE: int = 500
+    # Per request SQL statistics: Server-Timing header, and N+1 warnings for statements repeated this often (0 disables)
+    SERVER_TIMING_HEADER: bool = True
+    SQL_N_PLUS_ONE_THRESHOLD: int = 0
+    # Streaming
+    STREAM_YIELD_PER: int = 1000
+
+    # Bulk import
+    APPLICANT_IMPORT_BATCH_SIZE: int = 500
+    # Bulk application status changes: applications per UPDATE and transaction, and per request
+    BULK_STATUS_CHUNK_SIZE: int = 500
+    BULK_STATUS_MAX_ITEMS: int = 10000
+    # Bulk applicant deletion: applicants per transaction, and per request
+    APPLICANT_DELETE_CHUNK_SIZE: int = 1000
+    APPLICANT_DELETE_MAX_ITEMS: int = 100000
+
+    # Logging, LOG_FORMAT is "text" or "json"
+    LOG_LEVEL: str = "INFO"
+    ACCESS_LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"
+    # Fraction of successful access log lines kept for these paths, errors are always logged
+    ACCESS_LOG_SAMPLE_RATE: float = 0.1
+    ACCESS_LOG_SAMPLED_PATHS: List[str] = ["/health/live", "/health/ready", "/metrics", "/api/schemes"]
 
     class Config:
         env_file = "config.env"  # path to .env file
@@ -1,55 +1,116 @@
+import json
 import logging
-import sys
-from logging.handlers import TimedRotatingFileHandler
 import os
+import random
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from queue import SimpleQueue
+from typing import Optional
+
+from app.config.config import settings
 
 # Define basic configuration
-LOGGING_LEVEL = logging.DEBUG
 LOGFILE_DIR = "logs"
 LOGFILE_NAME = "fas_be.log"
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+
+# Set by RequestIdMiddleware for the duration of a request
+current_request_id: ContextVar[Optional[str]] = ContextVar("current_request_id", default=None)
+
+_listener: Optional[QueueListener] = None
+
+
+# Stamps records with the ID of the request they were logged from, before they are queued
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = current_request_id.get() or "-"
+        return True
+
+
+# Keeps a fraction of successful uvicorn access log lines for the configured high volume paths
+class AccessLogSampler(logging.Filter):
+    def __init__(self, rate: float, paths):
+        super().__init__()
+        self.rate = rate
+        self.paths = frozenset(paths)
+
+    def filter(self, record):
+        if self.rate >= 1 or not isinstance(record.args, tuple) or len(record.args) != 5:
+            return True
+        # uvicorn passes (client, method, path, http version, status)
+        path, status = record.args[2], record.args[4]
+        if not isinstance(status, int) or status >= 400 or path.split("?", 1)[0] not in self.paths:
+            return True
+        return random.random() < self.rate
 
-# Create logs directory if it does not exist
-if not os.path.exists(LOGFILE_DIR):
-    os.makedirs(LOGFILE_DIR)
-
-# Define loggers configuration
-LOGGING_CONFIG = {
-    "version": 1,
-    "disable_existing_loggers": False,
-    "formatters": {
-        "default": {
-            "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
         }
-    },
-    "handlers": {
-        "console": {
-            "class": "logging.StreamHandler",
-            "level": LOGGING_LEVEL,
-            "formatter": "default",
-            "stream": sys.stdout,
-        },
-        "file": {
-            "class": "logging.handlers.TimedRotatingFileHandler",
-            "level": LOGGING_LEVEL,
-            "formatter": "default",
-            "filename": os.path.join(LOGFILE_DIR, LOGFILE_NAME),
-            "when": "midnight",
-            "interval": 1,
-            "backupCount": 7,
-        },
-    },
-    "loggers": {
-        "uvicorn.access": {
-            "handlers": ["console", "file"],
-            "level": LOGGING_LEVEL,
-        },
-        "uvicorn.error": {
-            "handlers": ["console", "file"],
-            "level": LOGGING_LEVEL,
-        },
-        "myapp": {
-            "handlers": ["console", "file"],
-            "level": LOGGING_LEVEL,
-        },
-    },
-}
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+# Only renders the message on the calling thread, formatting and I/O happen on the listener thread
+class _QueueHandler(QueueHandler):
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+# Applied from the application lifespan rather than at import time.
+# Loggers put records on an in-memory queue, a listener thread formats them and writes to stdout and the log file.
+def setup_logging():
+    global _listener
+    if _listener is not None:
+        return
+
+    # Create logs directory if it does not exist
+    os.makedirs(LOGFILE_DIR, exist_ok=True)
+    formatter = JsonFormatter() if settings.LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+    console = logging.StreamHandler(sys.stdout)
+    logfile = TimedRotatingFileHandler(os.path.join(LOGFILE_DIR, LOGFILE_NAME), when="midnight", interval=1,
+                                       backupCount=7)
+    for handler in (console, logfile):
+        handler.setFormatter(formatter)
+
+    queue = SimpleQueue()
+    queue_handler = _QueueHandler(queue)
+    queue_handler.addFilter(RequestIdFilter())
+    _listener = QueueListener(queue, console, logfile)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(settings.LOG_LEVEL)
+    # uvicorn installs its own handlers before the application starts, route its loggers through the queue as well
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access", "myapp"):
+        logger = logging.getLogger(name)
+        logger.handlers = []
+        logger.propagate = True
+        logger.setLevel(settings.LOG_LEVEL)
+    access = logging.getLogger("uvicorn.access")
+    access.setLevel(settings.ACCESS_LOG_LEVEL)
+    access.filters = [AccessLogSampler(settings.ACCESS_LOG_SAMPLE_RATE, settings.ACCESS_LOG_SAMPLED_PATHS)]
+
+
+# Flushes the queue on shutdown, anything logged afterwards is written synchronously
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        root = logging.getLogger()
+        root.handlers = list(_listener.handlers)
+        for handler in root.handlers:
+            handler.addFilter(RequestIdFilter())
+        _listener = None
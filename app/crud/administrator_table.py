@@ -1,36 +1,39 @@
-from typing import Optional, Type
+from typing import Optional, Sequence
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models import Administrator
-from app.dependecies import get_password_hash
+from app.dependecies import get_password_hash, token_cache
+from app.hashing import run_hashing
 
 
 # Create a new administrator
-def create_administrator(db: Session, username: str, password: str) -> Administrator:
-    hashed_password = get_password_hash(password)
+async def create_administrator(db: AsyncSession, username: str, password: str) -> Administrator:
+    hashed_password = await run_hashing(get_password_hash, password)
     new_admin = Administrator(username=username, hashed_password=hashed_password)
     db.add(new_admin)
-    db.commit()
-    db.refresh(new_admin)
+    await db.commit()
+    await db.refresh(new_admin)
     return new_admin
 
 
 # Get an administrator by username
-def get_administrator_by_username(db: Session, username: str) -> Optional[Type[Administrator]]:
-    return db.query(Administrator).filter(Administrator.username == username).first()
+async def get_administrator_by_username(db: AsyncSession, username: str) -> Optional[Administrator]:
+    return (await db.scalars(select(Administrator).where(Administrator.username == username))).first()
 
 
 # Get all administrators
-def get_administrators(db: Session):
-    return db.query(Administrator).all()
+async def get_administrators(db: AsyncSession) -> Sequence[Administrator]:
+    return (await db.scalars(select(Administrator))).all()
 
 
 # Update administrator's active status
-def update_administrator_status(db: Session, admin_id: int, is_active: bool):
-    admin = db.query(Administrator).filter(Administrator.id == admin_id).first()
+async def update_administrator_status(db: AsyncSession, admin_id: int, is_active: bool):
+    admin = (await db.scalars(select(Administrator).where(Administrator.id == admin_id))).first()
     if admin:
         admin.is_active = is_active
-        db.commit()
-        db.refresh(admin)
+        await db.commit()
+        await db.refresh(admin)
+        token_cache.evict_where(lambda cached_admin: cached_admin.id == admin_id)
     return admin
@@ -1,97 +1,211 @@
-from sqlalchemy.orm import Session
-from app.db.models import Applicant, Person, HouseholdMember, Household
-from app.schema.applicant_schema import ApplicantCreate, ApplicantUpdate
-from typing import List, Optional
-
-
-def create_applicant(db: Session, applicant: ApplicantCreate) -> Applicant:
-    # Create the Person record
-    person = db.query(Person).filter(Person.ic_number == applicant.ic_number).first()
-    if not person:
-        person = Person(
-            name=applicant.name,
-            ic_number=applicant.ic_number,
-            date_of_birth=applicant.date_of_birth,
-            sex=applicant.sex,
-            employment_status=applicant.employment_status,
-            marital_status=applicant.marital_status
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager, joinedload
+from app.crud.eligibility_table import enqueue_applicant_refresh
+from app.crud.household_table import household_aggregates
+from app.db.models import Applicant, Person, HouseholdMember, Household, ApplicantSchemeEligibility, Application, \
+    EligibilityRefresh
+from app.eligibility_refresher import eligibility_refresher
+from app.enums import EmploymentStatus, MaritalStatus
+from app.schema.applicant_schema import ApplicantCreate, ApplicantUpdate, HouseholdMemberCreate
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Union
+
+
+def _person_row(person: Union[ApplicantCreate, HouseholdMemberCreate]) -> dict:
+    return {
+        "name": person.name,
+        "ic_number": person.ic_number,
+        "date_of_birth": person.date_of_birth,
+        "sex": person.sex,
+        "employment_status": person.employment_status,
+        "marital_status": person.marital_status,
+    }
+
+
+# Map IC numbers to Person records, inserting the persons that do not exist yet in a single executemany
+async def _resolve_persons(db: AsyncSession,
+                           persons: List[Union[ApplicantCreate, HouseholdMemberCreate]]) -> Dict[str, Person]:
+    ic_numbers = list({person.ic_number for person in persons})
+    resolved = {
+        person.ic_number: person
+        for person in await db.scalars(select(Person).where(Person.ic_number.in_(ic_numbers)))
+    }
+
+    new_persons = {}
+    for person in persons:
+        if person.ic_number not in resolved and person.ic_number not in new_persons:
+            new_persons[person.ic_number] = _person_row(person)
+
+    if new_persons:
+        await db.execute(insert(Person), list(new_persons.values()))
+        resolved.update(
+            (person.ic_number, person)
+            for person in await db.scalars(select(Person).where(Person.ic_number.in_(list(new_persons))))
         )
-        db.add(person)
-        db.commit()
-        db.refresh(person)
-
-    # Create a new Household record for each applicant
-    household = Household(address=applicant.address if applicant.address else "No Address Provided")
-    db.add(household)
-    db.commit()
-    db.refresh(household)
-
-    # Create the Applicant record linked to the newly created Household
-    new_applicant = Applicant(
-        person_id=person.id,
-        household_id=household.id
-    )
-    db.add(new_applicant)
-    db.commit()
-    db.refresh(new_applicant)
-
-    # Handle household members if provided
-    if applicant.household_members:
-        for member in applicant.household_members:
-            member_person = db.query(Person).filter(Person.ic_number == member.ic_number).first()
-            if not member_person:
-                member_person = Person(
-                    name=member.name,
-                    ic_number=member.ic_number,
-                    date_of_birth=member.date_of_birth,
-                    sex=member.sex,
-                    employment_status=member.employment_status,
-                    marital_status=member.marital_status,
-                )
-                db.add(member_person)
-                db.commit()
-                db.refresh(member_person)
-
-            new_member = HouseholdMember(
-                household_id=household.id,
-                person_id=member_person.id,
-                relation_to_applicant=member.relation_to_applicant
+    return resolved
+
+
+# Create several applicants in one transaction, their households are flushed together and all household
+# members are written with a single executemany
+async def create_applicants(db: AsyncSession, applicants: List[ApplicantCreate]) -> List[Applicant]:
+    try:
+        persons = []
+        for applicant in applicants:
+            persons.append(applicant)
+            persons.extend(applicant.household_members or [])
+        resolved = await _resolve_persons(db, persons)
+
+        # Create a new Household record for each applicant, with the aggregates of the members inserted below,
+        # and the Applicant record linked to it
+        new_applicants = [
+            Applicant(
+                person=resolved[applicant.ic_number],
+                household=Household(
+                    address=applicant.address if applicant.address else "No Address Provided",
+                    **household_aggregates(member.relation_to_applicant for member in applicant.household_members or []),
+                ),
             )
-            db.add(new_member)
-
-        db.commit()
-
-    return new_applicant
-
-
-def get_applicant_by_id(db: Session, applicant_id: int) -> Optional[Applicant]:
-    return db.query(Applicant).filter(Applicant.id == applicant_id).first()
-
-
-def update_applicant(db: Session, applicant_id: int, applicant_update: ApplicantUpdate) -> Optional[Applicant]:
-    applicant = db.query(Applicant).filter(Applicant.id == applicant_id).first()
+            for applicant in applicants
+        ]
+        db.add_all(new_applicants)
+        await db.flush()
+
+        member_rows = [
+            {
+                "household_id": new_applicant.household.id,
+                "person_id": resolved[member.ic_number].id,
+                "relation_to_applicant": member.relation_to_applicant,
+            }
+            for applicant, new_applicant in zip(applicants, new_applicants)
+            for member in applicant.household_members or []
+        ]
+        if member_rows:
+            await db.execute(insert(HouseholdMember), member_rows)
+        await enqueue_applicant_refresh(db, [new_applicant.id for new_applicant in new_applicants])
+
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+    eligibility_refresher.notify()
+    return new_applicants
+
+
+async def create_applicant(db: AsyncSession, applicant: ApplicantCreate) -> Applicant:
+    return (await create_applicants(db, [applicant]))[0]
+
+
+async def get_applicant_by_id(db: AsyncSession, applicant_id: int) -> Optional[Applicant]:
+    return (await db.scalars(
+        select(Applicant).options(joinedload(Applicant.person)).where(Applicant.id == applicant_id)
+    )).first()
+
+
+async def update_applicant(db: AsyncSession, applicant_id: int,
+                           applicant_update: ApplicantUpdate) -> Optional[Applicant]:
+    applicant = await get_applicant_by_id(db, applicant_id)
     if not applicant:
         return None
 
     person = applicant.person
+    status_changed = False
     for key, value in applicant_update.dict(exclude_unset=True).items():
         if hasattr(person, key):
+            if key in ("marital_status", "employment_status") and getattr(person, key) != value:
+                status_changed = True
             setattr(person, key, value)
 
-    db.commit()
-    db.refresh(applicant)
+    # Eligibility only depends on these two fields of the person
+    if status_changed:
+        await enqueue_applicant_refresh(db, [applicant_id])
+    await db.commit()
+    await db.refresh(person)
+    if status_changed:
+        eligibility_refresher.notify()
     return applicant
 
 
-def delete_applicant(db: Session, applicant_id: int) -> Optional[Applicant]:
-    applicant = db.query(Applicant).filter(Applicant.id == applicant_id).first()
-    if not applicant:
-        return None
-
-    db.delete(applicant)
-    db.commit()
-    return applicant
-
-
-def list_applicants(db: Session) -> List[Applicant]:
-    return db.query(Applicant).all()
+# Delete one chunk of applicants in its own transaction, together with their applications, eligibility rows and
+# queued refreshes, and the households (with their members) no remaining applicant belongs to
+async def _delete_applicant_chunk(db: AsyncSession, applicant_ids: List[int]) -> Dict[str, int]:
+    rows = (await db.execute(select(Applicant.id, Applicant.household_id).where(
+        Applicant.id.in_(applicant_ids)).with_for_update())).all()
+    counts = {"applicants": len(rows), "applications": 0, "households": 0, "household_members": 0}
+    if not rows:
+        await db.rollback()
+        return counts
+
+    found_ids = [row.id for row in rows]
+    household_ids = list({row.household_id for row in rows if row.household_id is not None})
+    try:
+        counts["applications"] = (await db.execute(delete(Application).where(
+            Application.applicant_id.in_(found_ids)).execution_options(synchronize_session=False))).rowcount
+        await db.execute(delete(ApplicantSchemeEligibility).where(
+            ApplicantSchemeEligibility.applicant_id.in_(found_ids)).execution_options(synchronize_session=False))
+        await db.execute(delete(EligibilityRefresh).where(
+            EligibilityRefresh.applicant_id.in_(found_ids)).execution_options(synchronize_session=False))
+        await db.execute(delete(Applicant).where(Applicant.id.in_(found_ids)).execution_options(
+            synchronize_session=False))
+
+        if household_ids:
+            shared = set(await db.scalars(select(Applicant.household_id).where(
+                Applicant.household_id.in_(household_ids)).distinct()))
+            orphaned = [household_id for household_id in household_ids if household_id not in shared]
+            if orphaned:
+                counts["household_members"] = (await db.execute(delete(HouseholdMember).where(
+                    HouseholdMember.household_id.in_(orphaned)).execution_options(synchronize_session=False))).rowcount
+                counts["households"] = (await db.execute(delete(Household).where(
+                    Household.id.in_(orphaned)).execution_options(synchronize_session=False))).rowcount
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return counts
+
+
+# Delete applicants with set based statements, chunk_size applicants per transaction, and return how many
+# applicants, applications, households and household members were removed. Persons are kept, they can be
+# shared with other applicants and households.
+async def delete_applicants(db: AsyncSession, applicant_ids: List[int], chunk_size: int = 1000) -> Dict[str, int]:
+    applicant_ids = list(dict.fromkeys(applicant_ids))
+    totals = {"applicants": 0, "applications": 0, "households": 0, "household_members": 0}
+    for start in range(0, len(applicant_ids), chunk_size):
+        for key, count in (await _delete_applicant_chunk(db, applicant_ids[start:start + chunk_size])).items():
+            totals[key] += count
+    return totals
+
+
+# Whether the applicant existed
+async def delete_applicant(db: AsyncSession, applicant_id: int) -> bool:
+    return (await delete_applicants(db, [applicant_id]))["applicants"] > 0
+
+
+def _filtered_applicants(after_id: Optional[int], employment_status: Optional[EmploymentStatus],
+                         marital_status: Optional[MaritalStatus]):
+    query = select(Applicant).join(Applicant.person).options(contains_eager(Applicant.person))
+    if after_id is not None:
+        query = query.where(Applicant.id > after_id)
+    if employment_status is not None:
+        query = query.where(Person.employment_status == employment_status)
+    if marital_status is not None:
+        query = query.where(Person.marital_status == marital_status)
+    return query.order_by(Applicant.id)
+
+
+# Keyset paginated listing, the Person of each applicant is loaded in the same query
+async def list_applicants(db: AsyncSession, after_id: Optional[int] = None, limit: int = 100,
+                          employment_status: Optional[EmploymentStatus] = None,
+                          marital_status: Optional[MaritalStatus] = None) -> Sequence[Applicant]:
+    return (await db.scalars(_filtered_applicants(after_id, employment_status, marital_status).limit(limit))).all()
+
+
+# Iterate over every matching applicant through a server-side cursor, yield_per rows at a time
+async def iter_applicants(db: AsyncSession, yield_per: int, after_id: Optional[int] = None,
+                          employment_status: Optional[EmploymentStatus] = None,
+                          marital_status: Optional[MaritalStatus] = None) -> AsyncIterator[Applicant]:
+    result = await db.stream_scalars(
+        _filtered_applicants(after_id, employment_status, marital_status).execution_options(yield_per=yield_per)
+    )
+    async for applicant in result:
+        yield applicant
@@ -1,48 +1,240 @@
-from typing import Optional, List, Type
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select, exists, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.models import Application
+from app.db.models import Application, Applicant, Person, Scheme, Household
+from app.enums import ApplicationStatus
 from app.schema.application_schema import ApplicationCreate, ApplicationUpdate
 
 
-def create_application(db: Session, application_data: ApplicationCreate) -> Application:
+# Statuses an application may move from, by the status it is moved to in bulk
+BULK_STATUS_TRANSITIONS = {
+    ApplicationStatus.APPROVED: (ApplicationStatus.PENDING,),
+    ApplicationStatus.REJECTED: (ApplicationStatus.PENDING,),
+}
+
+
+# Whether an IntegrityError was raised by uq_applications_pending (a second pending application)
+def is_pending_conflict(error: IntegrityError) -> bool:
+    message = str(error.orig)
+    return "uq_applications_pending" in message or "pending_key" in message
+
+
+# Everything create_new_application validates, fetched in one round trip from the applicant, person and household
+# rows: None when the applicant does not exist, NULL scheme columns when the scheme does not exist.
+async def get_application_validation_row(db: AsyncSession, applicant_id: int, scheme_id: int):
+    pending_exists = exists().where(
+        Application.applicant_id == applicant_id,
+        Application.scheme_id == scheme_id,
+        Application.status == ApplicationStatus.PENDING,
+    )
+    return (await db.execute(
+        select(
+            Person.marital_status,
+            Person.employment_status,
+            Scheme.id.label("scheme_id"),
+            Scheme.marital_status_required,
+            Scheme.employment_status_required,
+            Scheme.household_size,
+            Scheme.required_relationships,
+            Household.member_count,
+            Household.relationships,
+            pending_exists.label("has_pending"),
+        )
+        .select_from(Applicant)
+        .join(Person, Applicant.person_id == Person.id)
+        .outerjoin(Household, Household.id == Applicant.household_id)
+        .outerjoin(Scheme, Scheme.id == scheme_id)
+        .where(Applicant.id == applicant_id)
+    )).first()
+
+
+# The pending uniqueness rule is enforced by the database, a concurrent duplicate raises IntegrityError here
+async def create_application(db: AsyncSession, application_data: ApplicationCreate) -> Application:
     new_application = Application(
         applicant_id=application_data.applicant_id,
         scheme_id=application_data.scheme_id,
+        status=ApplicationStatus.PENDING,
     )
     db.add(new_application)
-    db.commit()
-    db.refresh(new_application)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise
     return new_application
 
 
-def get_application_by_id(db: Session, application_id: int) -> Optional[Application]:
-    return db.query(Application).filter(Application.id == application_id).first()
+async def get_application_by_id(db: AsyncSession, application_id: int) -> Optional[Application]:
+    return (await db.scalars(select(Application).where(Application.id == application_id))).first()
 
 
-def update_application(db: Session, application_id: int, application_update: ApplicationUpdate) -> Optional[Application]:
-    application = db.query(Application).filter(Application.id == application_id).first()
+async def update_application(db: AsyncSession, application_id: int,
+                             application_update: ApplicationUpdate) -> Optional[Application]:
+    application = await get_application_by_id(db, application_id)
     if not application:
         return None
 
     for key, value in application_update.dict(exclude_unset=True).items():
         setattr(application, key, value)
 
-    db.commit()
-    db.refresh(application)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise
+    await db.refresh(application)
     return application
 
 
-def delete_application(db: Session, application_id: int) -> Optional[Application]:
-    application = db.query(Application).filter(Application.id == application_id).first()
+async def delete_application(db: AsyncSession, application_id: int) -> Optional[Application]:
+    application = await get_application_by_id(db, application_id)
     if not application:
         return None
 
-    db.delete(application)
-    db.commit()
+    await db.delete(application)
+    await db.commit()
     return application
 
 
-def list_applications(db: Session) -> list[Type[Application]]:
-    return db.query(Application).all()
+# Move one chunk of applications to status in its own transaction and return the outcome for each ID:
+# "updated", "unchanged" (already there), "invalid_transition" or "not_found", with the status it ends up in.
+# The rows are locked by the first statement, so the outcomes match what the UPDATE did.
+async def _transition_chunk(db: AsyncSession, application_ids: List[int],
+                            status: ApplicationStatus) -> Dict[int, Tuple[str, Optional[ApplicationStatus]]]:
+    sources = BULK_STATUS_TRANSITIONS[status]
+    current = dict((await db.execute(select(Application.id, Application.status).where(
+        Application.id.in_(application_ids)).with_for_update())).all())
+    outcomes = {}
+    for application_id in application_ids:
+        previous = current.get(application_id)
+        if previous is None:
+            outcomes[application_id] = ("not_found", None)
+        elif previous in sources:
+            outcomes[application_id] = ("updated", status)
+        elif previous == status:
+            outcomes[application_id] = ("unchanged", status)
+        else:
+            outcomes[application_id] = ("invalid_transition", previous)
+
+    try:
+        if any(outcome == "updated" for outcome, _ in outcomes.values()):
+            await db.execute(update(Application).where(
+                Application.id.in_(application_ids), Application.status.in_(sources)
+            ).values(status=status).execution_options(synchronize_session=False))
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return outcomes
+
+
+# Move the given applications to status with one UPDATE per chunk_size IDs, each chunk committed on its own.
+# Returns the outcome of every distinct ID, in request order.
+async def bulk_update_application_status(
+        db: AsyncSession, application_ids: List[int], status: ApplicationStatus,
+        chunk_size: int) -> List[Tuple[int, str, Optional[ApplicationStatus]]]:
+    application_ids = list(dict.fromkeys(application_ids))
+    outcomes = {}
+    for start in range(0, len(application_ids), chunk_size):
+        outcomes.update(await _transition_chunk(db, application_ids[start:start + chunk_size], status))
+    return [(application_id, *outcomes[application_id]) for application_id in application_ids]
+
+
+# Move up to limit applications matching the filter that are allowed to move to status, chunk_size at a time.
+# Also returns whether matching applications were left because of the limit.
+async def bulk_update_application_status_by_filter(
+        db: AsyncSession, status: ApplicationStatus, scheme_id: Optional[int], applicant_id: Optional[int],
+        date_from: Optional[datetime], date_to: Optional[datetime], limit: int,
+        chunk_size: int) -> Tuple[List[Tuple[int, str, Optional[ApplicationStatus]]], bool]:
+    query = _filtered_applications(None, None, scheme_id, applicant_id, date_from, date_to).where(
+        Application.status.in_(BULK_STATUS_TRANSITIONS[status])).with_only_columns(Application.id)
+    results = []
+    last_id = 0
+    while len(results) < limit:
+        application_ids = (await db.scalars(
+            query.where(Application.id > last_id).limit(min(chunk_size, limit - len(results))))).all()
+        if not application_ids:
+            break
+        last_id = application_ids[-1]
+        outcomes = await _transition_chunk(db, list(application_ids), status)
+        results.extend((application_id, *outcomes[application_id]) for application_id in application_ids)
+    # Truncated when the limit was reached with matching applications left over
+    truncated = len(results) >= limit and (await db.scalars(
+        query.where(Application.id > last_id).limit(1))).first() is not None
+    return results, truncated
+
+
+def _filtered_applications(after_id: Optional[int], status: Optional[ApplicationStatus], scheme_id: Optional[int],
+                           applicant_id: Optional[int], date_from: Optional[datetime], date_to: Optional[datetime]):
+    query = select(Application)
+    if after_id is not None:
+        query = query.where(Application.id > after_id)
+    if status is not None:
+        query = query.where(Application.status == status)
+    if scheme_id is not None:
+        query = query.where(Application.scheme_id == scheme_id)
+    if applicant_id is not None:
+        query = query.where(Application.applicant_id == applicant_id)
+    if date_from is not None:
+        query = query.where(Application.application_date >= date_from)
+    if date_to is not None:
+        query = query.where(Application.application_date <= date_to)
+    return query.order_by(Application.id)
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# Search by any combination of applicant, applicant name prefix, IC number, status, scheme and submission date.
+# Returns one page and the total number of matches, counted by a window function in the same query.
+# The name prefix is a LIKE 'prefix%' range scan on ix_persons_name, the IC number a lookup on its unique index,
+# and applicants and applications are then reached through ix_applicants_person_id and uq_applications_pending.
+async def search_applications(db: AsyncSession, applicant_id: Optional[int] = None, name: Optional[str] = None,
+                              ic_number: Optional[str] = None, status: Optional[ApplicationStatus] = None,
+                              scheme_id: Optional[int] = None, date_from: Optional[datetime] = None,
+                              date_to: Optional[datetime] = None, offset: int = 0,
+                              limit: int = 100) -> Tuple[Sequence[Application], int]:
+    query = _filtered_applications(None, status, scheme_id, applicant_id, date_from, date_to)
+    if name or ic_number:
+        query = query.join(Applicant, Application.applicant_id == Applicant.id).join(
+            Person, Applicant.person_id == Person.id)
+        if name:
+            query = query.where(Person.name.like(_escape_like(name) + "%", escape="\\"))
+        if ic_number:
+            query = query.where(Person.ic_number == ic_number)
+    rows = (await db.execute(query.add_columns(func.count().over().label("total")).offset(offset).limit(limit))).all()
+    if rows:
+        return [row[0] for row in rows], rows[0].total
+    if not offset:
+        return [], 0
+    # A page past the end carries no window count, count the matches separately
+    total = (await db.execute(select(func.count()).select_from(query.order_by(None).subquery()))).scalar_one()
+    return [], total
+
+
+# Keyset paginated listing
+async def list_applications(db: AsyncSession, after_id: Optional[int] = None, limit: int = 100,
+                            status: Optional[ApplicationStatus] = None, scheme_id: Optional[int] = None,
+                            applicant_id: Optional[int] = None, date_from: Optional[datetime] = None,
+                            date_to: Optional[datetime] = None) -> Sequence[Application]:
+    return (await db.scalars(
+        _filtered_applications(after_id, status, scheme_id, applicant_id, date_from, date_to).limit(limit)
+    )).all()
+
+
+# Iterate over every matching application through a server-side cursor, yield_per rows at a time
+async def iter_applications(db: AsyncSession, yield_per: int, after_id: Optional[int] = None,
+                            status: Optional[ApplicationStatus] = None, scheme_id: Optional[int] = None,
+                            applicant_id: Optional[int] = None, date_from: Optional[datetime] = None,
+                            date_to: Optional[datetime] = None) -> AsyncIterator[Application]:
+    result = await db.stream_scalars(
+        _filtered_applications(after_id, status, scheme_id, applicant_id, date_from,
+                               date_to).execution_options(yield_per=yield_per)
+    )
+    async for application in result:
+        yield application
@@ -0,0 +1,114 @@
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Applicant, Household, Person, Scheme
+from app.enums import EmploymentStatus, MaritalStatus
+
+# Enum code used for "no requirement" on the scheme side
+ANY = -1
+MARITAL_CODES = {status: code for code, status in enumerate(MaritalStatus)}
+EMPLOYMENT_CODES = {status: code for code, status in enumerate(EmploymentStatus)}
+
+
+@dataclass
+class EligibilityInputs:
+    scheme_ids: np.ndarray
+    scheme_marital: np.ndarray
+    scheme_employment: np.ndarray
+    scheme_household_size: np.ndarray
+    scheme_relationships: np.ndarray  # (schemes, words) uint64 bitmask
+    applicant_ids: np.ndarray
+    applicant_marital: np.ndarray
+    applicant_employment: np.ndarray
+    applicant_household_size: np.ndarray
+    applicant_relationships: np.ndarray  # (applicants, words) uint64 bitmask
+
+
+def _mask(relationships, relationship_bits: Dict[str, int], words: int) -> np.ndarray:
+    mask = np.zeros(words, dtype=np.uint64)
+    for relationship in relationships or ():
+        bit = relationship_bits.get(relationship)
+        if bit is not None:
+            mask[bit // 64] |= np.uint64(1 << (bit % 64))
+    return mask
+
+
+# Load applicants with their household aggregates and schemes once and encode them as arrays
+async def load_eligibility_inputs(db: AsyncSession) -> EligibilityInputs:
+    schemes = (await db.execute(select(
+        Scheme.id,
+        Scheme.marital_status_required,
+        Scheme.employment_status_required,
+        Scheme.household_size,
+        Scheme.required_relationships,
+    ).order_by(Scheme.id))).all()
+
+    relationship_bits: Dict[str, int] = {}
+    for scheme in schemes:
+        for relationship in scheme.required_relationships or ():
+            relationship_bits.setdefault(relationship, len(relationship_bits))
+    words = max(1, -(-len(relationship_bits) // 64))
+
+    # Household size and relationships come from the aggregates maintained on the household row
+    applicants = (await db.execute(select(
+        Applicant.id,
+        Person.marital_status,
+        Person.employment_status,
+        Household.member_count,
+        Household.relationships,
+    ).join(Person, Applicant.person_id == Person.id).outerjoin(
+        Household, Applicant.household_id == Household.id).order_by(Applicant.id))).all()
+
+    return EligibilityInputs(
+        scheme_ids=np.array([scheme.id for scheme in schemes], dtype=np.int64),
+        scheme_marital=np.array(
+            [MARITAL_CODES.get(scheme.marital_status_required, ANY) for scheme in schemes], dtype=np.int8),
+        scheme_employment=np.array(
+            [EMPLOYMENT_CODES.get(scheme.employment_status_required, ANY) for scheme in schemes], dtype=np.int8),
+        scheme_household_size=np.array([scheme.household_size or 0 for scheme in schemes], dtype=np.int32),
+        scheme_relationships=np.array(
+            [_mask(scheme.required_relationships, relationship_bits, words) for scheme in schemes],
+            dtype=np.uint64).reshape(len(schemes), words),
+        applicant_ids=np.array([applicant.id for applicant in applicants], dtype=np.int64),
+        applicant_marital=np.array([MARITAL_CODES[applicant.marital_status] for applicant in applicants],
+                                   dtype=np.int8),
+        applicant_employment=np.array(
+            [EMPLOYMENT_CODES[applicant.employment_status] for applicant in applicants], dtype=np.int8),
+        applicant_household_size=np.array([applicant.member_count or 0 for applicant in applicants], dtype=np.int32),
+        applicant_relationships=np.array(
+            [_mask(applicant.relationships, relationship_bits, words) for applicant in applicants],
+            dtype=np.uint64).reshape(len(applicants), words),
+    )
+
+
+# Compute the applicant x scheme eligibility matrix, chunk_size applicants (rows) at a time
+def iter_eligibility_matrix(inputs: EligibilityInputs, chunk_size: int = 1000) -> Iterator[
+        Tuple[np.ndarray, np.ndarray]]:
+    scheme_marital = inputs.scheme_marital[np.newaxis, :]
+    scheme_employment = inputs.scheme_employment[np.newaxis, :]
+    scheme_household_size = inputs.scheme_household_size[np.newaxis, :]
+    scheme_relationships = inputs.scheme_relationships[np.newaxis, :, :]
+
+    for start in range(0, len(inputs.applicant_ids), chunk_size):
+        end = start + chunk_size
+        marital = inputs.applicant_marital[start:end, np.newaxis]
+        employment = inputs.applicant_employment[start:end, np.newaxis]
+        household_size = inputs.applicant_household_size[start:end, np.newaxis]
+        relationships = inputs.applicant_relationships[start:end, np.newaxis, :]
+
+        eligible = (scheme_marital == ANY) | (scheme_marital == marital)
+        eligible &= (scheme_employment == ANY) | (scheme_employment == employment)
+        eligible &= scheme_household_size <= household_size
+        eligible &= np.all((relationships & scheme_relationships) == scheme_relationships, axis=2)
+        yield inputs.applicant_ids[start:end], eligible
+
+
+# Yield (applicant_id, eligible scheme ids) pairs from the matrix
+def iter_eligible_scheme_ids(inputs: EligibilityInputs, chunk_size: int = 1000) -> Iterator[Tuple[int, List[int]]]:
+    for applicant_ids, eligible in iter_eligibility_matrix(inputs, chunk_size):
+        for applicant_id, row in zip(applicant_ids.tolist(), eligible):
+            yield applicant_id, inputs.scheme_ids[row].tolist()
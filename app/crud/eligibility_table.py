@@ -0,0 +1,141 @@
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, insert, literal, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.crud.scheme_index import scheme_index
+from app.db.models import Applicant, ApplicantSchemeEligibility, EligibilityRefresh, Household, Person, Scheme
+
+
+# Queue eligibility refreshes for the given applicants, in the caller's transaction
+async def enqueue_applicant_refresh(db: AsyncSession, applicant_ids: Iterable[int]):
+    rows = [{"applicant_id": applicant_id} for applicant_id in applicant_ids]
+    if rows:
+        await db.execute(insert(EligibilityRefresh), rows)
+
+
+# Queue the evaluation of a new scheme against every applicant, in the caller's transaction
+async def enqueue_scheme_refresh(db: AsyncSession, scheme_id: int):
+    await db.execute(insert(EligibilityRefresh), [{"scheme_id": scheme_id}])
+
+
+# The materialized rows of an applicant are current when no refresh is queued for them, for a scheme or for everyone
+async def is_eligibility_current(db: AsyncSession, applicant_id: int) -> bool:
+    return (await db.execute(select(EligibilityRefresh.id).where(or_(
+        EligibilityRefresh.applicant_id == applicant_id, EligibilityRefresh.applicant_id.is_(None))).limit(1)
+    )).first() is None
+
+
+async def get_materialized_eligible_schemes(db: AsyncSession, applicant_id: int) -> Sequence[Scheme]:
+    return (await db.scalars(
+        select(Scheme).options(selectinload(Scheme.benefits)).join(
+            ApplicantSchemeEligibility, ApplicantSchemeEligibility.scheme_id == Scheme.id).where(
+            ApplicantSchemeEligibility.applicant_id == applicant_id).order_by(Scheme.id)
+    )).all()
+
+
+# Number of queued refreshes and when the oldest one was queued
+async def get_refresh_backlog(db: AsyncSession) -> Tuple[int, Optional[datetime]]:
+    pending, oldest = (await db.execute(
+        select(func.count(EligibilityRefresh.id), func.min(EligibilityRefresh.enqueued_at)))).one()
+    return pending, oldest
+
+
+def _applicant_inputs():
+    return select(
+        Applicant.id,
+        Person.marital_status,
+        Person.employment_status,
+        Household.member_count,
+        Household.relationships,
+    ).join(Person, Applicant.person_id == Person.id).outerjoin(Household, Applicant.household_id == Household.id)
+
+
+# Replace the rows of the given applicants with their eligibility against every scheme the index knows.
+# Rows of schemes created after the index was built are left alone, their own scheme refresh writes them.
+async def _refresh_applicants(db: AsyncSession, applicant_ids: Sequence[int], computed_at: datetime):
+    await scheme_index.ensure_current(db)
+    applicants = (await db.execute(_applicant_inputs().where(Applicant.id.in_(applicant_ids)))).all()
+    # No await from here until the rows are built, so the index cannot change underneath
+    max_scheme_id = scheme_index.max_scheme_id
+    rows = [
+        {"applicant_id": applicant.id, "scheme_id": scheme_id, "computed_at": computed_at}
+        for applicant in applicants
+        for scheme_id in scheme_index.eligible_scheme_ids(applicant.marital_status, applicant.employment_status,
+                                                          applicant.member_count or 0, applicant.relationships or ())
+    ]
+    await db.execute(delete(ApplicantSchemeEligibility).where(
+        ApplicantSchemeEligibility.applicant_id.in_(applicant_ids),
+        ApplicantSchemeEligibility.scheme_id <= max_scheme_id))
+    if rows:
+        await db.execute(insert(ApplicantSchemeEligibility), rows)
+
+
+# Replace the rows of one scheme, walking the applicants that pass its status and household size requirements
+# batch_size at a time
+async def _refresh_scheme(db: AsyncSession, scheme_id: int, computed_at: datetime, batch_size: int):
+    await db.execute(delete(ApplicantSchemeEligibility).where(ApplicantSchemeEligibility.scheme_id == scheme_id))
+    scheme = (await db.execute(select(
+        Scheme.marital_status_required,
+        Scheme.employment_status_required,
+        Scheme.household_size,
+        Scheme.required_relationships,
+    ).where(Scheme.id == scheme_id))).first()
+    if scheme is None:
+        return
+
+    query = _applicant_inputs()
+    if scheme.marital_status_required is not None:
+        query = query.where(Person.marital_status == scheme.marital_status_required)
+    if scheme.employment_status_required is not None:
+        query = query.where(Person.employment_status == scheme.employment_status_required)
+    if scheme.household_size:
+        query = query.where(Household.member_count >= scheme.household_size)
+    required = set(scheme.required_relationships or ())
+
+    last_id = 0
+    while True:
+        applicants = (await db.execute(query.where(Applicant.id > last_id).order_by(Applicant.id).limit(batch_size))).all()
+        if not applicants:
+            break
+        last_id = applicants[-1].id
+        rows = [
+            {"applicant_id": applicant.id, "scheme_id": scheme_id, "computed_at": computed_at}
+            for applicant in applicants
+            if required.issubset(applicant.relationships or ())
+        ]
+        if rows:
+            await db.execute(insert(ApplicantSchemeEligibility), rows)
+
+
+# Process up to batch_size queued refreshes and remove them from the queue, returning the number of entries,
+# applicants and schemes handled. Entries are locked while they are processed and skipped by other workers.
+# Runs inside the caller's transaction, which should be committed afterwards.
+async def refresh_queued_eligibility(db: AsyncSession, batch_size: int) -> Dict[str, int]:
+    entries = (await db.execute(select(
+        EligibilityRefresh.id,
+        EligibilityRefresh.applicant_id,
+        EligibilityRefresh.scheme_id,
+        EligibilityRefresh.enqueued_at,
+    ).order_by(EligibilityRefresh.id).limit(batch_size).with_for_update(skip_locked=True))).all()
+    if not entries:
+        return {"entries": 0, "applicants": 0, "schemes": 0}
+
+    computed_at = datetime.utcnow()
+    applicant_ids = sorted({entry.applicant_id for entry in entries if entry.applicant_id is not None})
+    scheme_ids = sorted({entry.scheme_id for entry in entries if entry.applicant_id is None and entry.scheme_id is not None})
+
+    for entry in entries:
+        if entry.applicant_id is None and entry.scheme_id is None:
+            # A full refresh is split into one entry per applicant, keeping its enqueue time for the lag
+            await db.execute(insert(EligibilityRefresh).from_select(
+                ["applicant_id", "enqueued_at"], select(Applicant.id, literal(entry.enqueued_at))))
+    for scheme_id in scheme_ids:
+        await _refresh_scheme(db, scheme_id, computed_at, batch_size)
+    if applicant_ids:
+        await _refresh_applicants(db, applicant_ids, computed_at)
+
+    await db.execute(delete(EligibilityRefresh).where(EligibilityRefresh.id.in_([entry.id for entry in entries])))
+    return {"entries": len(entries), "applicants": len(applicant_ids), "schemes": len(scheme_ids)}
@@ -0,0 +1,41 @@
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Household, HouseholdMember
+
+
+# The aggregates kept on a household row for the given member relationships
+def household_aggregates(relationships: Iterable[Optional[str]]) -> dict:
+    relationships = list(relationships)
+    return {
+        "member_count": len(relationships),
+        "relationships": sorted({relationship for relationship in relationships if relationship is not None}),
+    }
+
+
+# Recompute member_count and relationships of the given households from household_members and write the ones
+# that changed, returning how many did. Runs inside the caller's transaction: call it after inserting or deleting
+# members and before committing.
+async def refresh_household_aggregates(db: AsyncSession, household_ids: List[int]) -> int:
+    if not household_ids:
+        return 0
+    members: Dict[int, List[str]] = {household_id: [] for household_id in household_ids}
+    for household_id, relationship in await db.execute(
+            select(HouseholdMember.household_id, HouseholdMember.relation_to_applicant).where(
+                HouseholdMember.household_id.in_(household_ids))):
+        members[household_id].append(relationship)
+
+    changed = []
+    for household_id, member_count, relationships in await db.execute(
+            select(Household.id, Household.member_count, Household.relationships).where(
+                Household.id.in_(household_ids))):
+        aggregates = household_aggregates(members[household_id])
+        if member_count != aggregates["member_count"] or (relationships or []) != aggregates["relationships"]:
+            changed.append({"id": household_id, **aggregates})
+
+    if changed:
+        # ORM bulk UPDATE by primary key, a single executemany
+        await db.execute(update(Household), changed)
+    return len(changed)
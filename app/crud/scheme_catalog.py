@@ -0,0 +1,61 @@
+import asyncio
+import hashlib
+from typing import Optional, Tuple
+
+import orjson
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.cache import TTLCache
+from app.config.config import settings
+from app.db.models import Scheme
+from app.schema.mappers import scheme_to_dict
+
+_CATALOG_KEY = "schemes"
+
+
+# The public scheme catalog, serialized once and kept as JSON bytes with a content hash for ETags.
+# create_scheme invalidates it in this worker, other workers pick the change up when their copy expires.
+class SchemeCatalog:
+    def __init__(self, ttl: float):
+        self._cache = TTLCache(maxsize=1, ttl=ttl, name="scheme_catalog")
+        self._lock = asyncio.Lock()
+        # Bumped on every invalidation so a rebuild that raced with a new scheme is not stored
+        self._generation = 0
+
+    def invalidate(self):
+        self._generation += 1
+        self._cache.clear()
+
+    # Returns (body, etag)
+    async def get(self, db: AsyncSession) -> Tuple[bytes, str]:
+        async with self._lock:
+            entry = self._cache.get(_CATALOG_KEY)
+            if entry is not None:
+                return entry
+
+            generation = self._generation
+            schemes = (await db.scalars(select(Scheme).options(selectinload(Scheme.benefits)).order_by(Scheme.id))).all()
+            body = orjson.dumps([scheme_to_dict(scheme) for scheme in schemes])
+            entry = (body, '"%s"' % hashlib.sha256(body).hexdigest())
+            if generation == self._generation:
+                self._cache.set(_CATALOG_KEY, entry)
+            return entry
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+# Whether an If-None-Match header matches the current ETag (weak comparison, as for GET)
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+scheme_catalog = SchemeCatalog(ttl=settings.SCHEME_CATALOG_TTL_SECONDS)
@@ -0,0 +1,116 @@
+import threading
+import time
+from bisect import bisect_right, insort
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.config import settings
+from app.db.database import new_session
+from app.db.models import Scheme
+
+
+# In-process eligibility index over the schemes table.
+# Schemes are bucketed by (marital_status_required, employment_status_required), each bucket is kept
+# sorted by minimum household size, and required relationships are compiled into a bitset so a lookup
+# only visits the buckets that can match and stops at the first scheme that needs a bigger household.
+class SchemeEligibilityIndex:
+    def __init__(self, check_interval: float):
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple, List[Tuple[int, int, int]]] = {}
+        self._bucket_sizes: Dict[Tuple, List[int]] = {}
+        self._relationship_bits: Dict[str, int] = {}
+        # (row count, max id) of the schemes table the index was built from, None when not built yet
+        self._fingerprint: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+        self.check_interval = check_interval
+
+    def _relationship_mask(self, relationships: Optional[Iterable[str]], assign: bool = False) -> int:
+        mask = 0
+        for relationship in relationships or ():
+            bit = self._relationship_bits.get(relationship)
+            if bit is None:
+                if not assign:
+                    continue
+                bit = 1 << len(self._relationship_bits)
+                self._relationship_bits[relationship] = bit
+            mask |= bit
+        return mask
+
+    def _insert(self, scheme_id: int, marital_status, employment_status, household_size: Optional[int],
+                required_relationships: Optional[List[str]]):
+        key = (marital_status, employment_status)
+        min_size = household_size or 0
+        entry = (min_size, scheme_id, self._relationship_mask(required_relationships, assign=True))
+        insort(self._buckets.setdefault(key, []), entry)
+        insort(self._bucket_sizes.setdefault(key, []), min_size)
+
+    async def rebuild(self, db: AsyncSession):
+        rows = (await db.execute(select(
+            Scheme.id,
+            Scheme.marital_status_required,
+            Scheme.employment_status_required,
+            Scheme.household_size,
+            Scheme.required_relationships,
+        ))).all()
+        with self._lock:
+            self._buckets = {}
+            self._bucket_sizes = {}
+            self._relationship_bits = {}
+            for row in rows:
+                self._insert(*row)
+            self._fingerprint = (len(rows), max((row.id for row in rows), default=0))
+
+    # Incrementally add a freshly created scheme
+    def add(self, scheme: Scheme):
+        with self._lock:
+            if self._fingerprint is None:
+                return
+            self._insert(scheme.id, scheme.marital_status_required, scheme.employment_status_required,
+                         scheme.household_size, scheme.required_relationships)
+            count, max_id = self._fingerprint
+            self._fingerprint = (count + 1, max(max_id, scheme.id))
+
+    # Rebuild when another worker has created schemes since this index was built. The index is shared by the
+    # whole process, so db must read from the primary, never from a lagging replica.
+    async def ensure_current(self, db: AsyncSession):
+        count, max_id = (await db.execute(select(func.count(Scheme.id), func.max(Scheme.id)))).one()
+        self._checked_at = time.monotonic()
+        if self._fingerprint != (count, max_id or 0):
+            await self.rebuild(db)
+
+    # For callers reading from a replica: checks against the primary at most every check_interval seconds,
+    # so schemes created by other workers show up after at most that long
+    async def ensure_recent(self):
+        if self._fingerprint is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return
+        async with new_session() as db:
+            await self.ensure_current(db)
+
+    # Highest scheme ID the index was built with, or 0 when it is not built
+    @property
+    def max_scheme_id(self) -> int:
+        with self._lock:
+            return self._fingerprint[1] if self._fingerprint else 0
+
+    def eligible_scheme_ids(self, marital_status, employment_status, household_size: int,
+                            relationships: Iterable[str]) -> List[int]:
+        with self._lock:
+            household_mask = self._relationship_mask(relationships)
+            scheme_ids = []
+            for key in {(None, None), (marital_status, None), (None, employment_status),
+                        (marital_status, employment_status)}:
+                bucket = self._buckets.get(key)
+                if not bucket:
+                    continue
+                end = bisect_right(self._bucket_sizes[key], household_size)
+                for _, scheme_id, required_mask in islice(bucket, end):
+                    if required_mask & ~household_mask == 0:
+                        scheme_ids.append(scheme_id)
+        scheme_ids.sort()
+        return scheme_ids
+
+
+scheme_index = SchemeEligibilityIndex(check_interval=settings.SCHEME_INDEX_CHECK_SECONDS)
@@ -1,60 +1,75 @@
-from sqlalchemy.orm import Session
+from typing import Sequence
 
-from app.db.models import Scheme, HouseholdMember, Benefit
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.crud.eligibility_table import enqueue_scheme_refresh, is_eligibility_current, \
+    get_materialized_eligible_schemes
+from app.crud.scheme_catalog import scheme_catalog
+from app.crud.scheme_index import scheme_index
+from app.db.models import Scheme, Household, Benefit
+from app.eligibility_refresher import eligibility_refresher
 from app.schema.scheme_schema import SchemeCreate
 
 
-def create_scheme(db: Session, scheme_data: SchemeCreate) -> Scheme:
-    # Create the scheme
+async def create_scheme(db: AsyncSession, scheme_data: SchemeCreate) -> Scheme:
+    # Create the scheme together with its associated benefits
     new_scheme = Scheme(
         name=scheme_data.name,
         description=scheme_data.description,
         marital_status_required=scheme_data.marital_status_required,
         employment_status_required=scheme_data.employment_status_required,
         required_relationships=scheme_data.required_relationships,
-        household_size=scheme_data.household_size
+        household_size=scheme_data.household_size,
+        benefits=[
+            Benefit(
+                description=benefit.description,
+                amount=benefit.amount,
+                condition=benefit.condition
+            )
+            for benefit in scheme_data.benefits
+        ]
     )
     db.add(new_scheme)
-    db.commit()
-    db.refresh(new_scheme)
-
-    # Create the associated benefits
-    for benefit in scheme_data.benefits:
-        new_benefit = Benefit(
-            scheme_id=new_scheme.id,
-            description=benefit.description,
-            amount=benefit.amount,
-            condition=benefit.condition
-        )
-        db.add(new_benefit)
-
-    db.commit()
+    await db.flush()
+    # Materialized eligibility only needs the new scheme evaluated against the applicants
+    await enqueue_scheme_refresh(db, new_scheme.id)
+    await db.commit()
+    scheme_index.add(new_scheme)
+    scheme_catalog.invalidate()
+    eligibility_refresher.notify()
 
     return new_scheme
 
 
-def get_all_schemes(db: Session) -> list[Scheme]:
-    return db.query(Scheme).all()
+async def get_all_schemes(db: AsyncSession) -> Sequence[Scheme]:
+    return (await db.scalars(select(Scheme).options(selectinload(Scheme.benefits)))).all()
 
 
-def get_eligible_schemes_for_applicant(db: Session, applicant) -> list[Scheme]:
-    schemes = db.query(Scheme).all()
-    eligible_schemes = []
+# Read from the materialized eligibility table, or evaluated through the scheme index while a refresh that
+# concerns the applicant is still queued
+async def get_eligible_schemes_for_applicant(db: AsyncSession, applicant) -> Sequence[Scheme]:
+    if await is_eligibility_current(db, applicant.id):
+        return await get_materialized_eligible_schemes(db, applicant.id)
+    # Make sure this worker is draining the queue, e.g. the full refresh queued by a migration
+    eligibility_refresher.notify()
 
-    for scheme in schemes:
-        if (
-            (scheme.marital_status_required is None or scheme.marital_status_required == applicant.person.marital_status) and
-            (scheme.employment_status_required is None or scheme.employment_status_required == applicant.person.employment_status) and
-            (scheme.household_size is None or scheme.household_size <= len(applicant.household.members))
-        ):
-            if not scheme.required_relationships:
-                eligible_schemes.append(scheme)
-                continue
+    await scheme_index.ensure_recent()
 
-            household_members = db.query(HouseholdMember).filter(HouseholdMember.household_id == applicant.household_id).all()
-            relationships = [member.relation_to_applicant for member in household_members]
-
-            if all(req_rel in relationships for req_rel in scheme.required_relationships):
-                eligible_schemes.append(scheme)
+    # The household row carries its member count and relationships
+    household = (await db.execute(
+        select(Household.member_count, Household.relationships).where(Household.id == applicant.household_id)
+    )).first()
+    scheme_ids = scheme_index.eligible_scheme_ids(
+        applicant.person.marital_status,
+        applicant.person.employment_status,
+        household.member_count if household else 0,
+        household.relationships or () if household else (),
+    )
+    if not scheme_ids:
+        return []
 
-    return eligible_schemes
+    return (await db.scalars(
+        select(Scheme).options(selectinload(Scheme.benefits)).where(Scheme.id.in_(scheme_ids)).order_by(Scheme.id)
+    )).all()
@@ -1,10 +1,16 @@
 
+from typing import List, Optional
+
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from fastapi import Depends, Request
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.config.config import settings
+from app.db.pool_metrics import InstrumentedQueuePool, install_pool_metrics
+from app.db.query_stats import install_query_stats
+from app.db.routing import ReplicaSet, RoutingSession
 
 load_dotenv()
 
@@ -13,19 +19,97 @@ SQL_DATABASE = settings.SQL_DATABASE
 SQL_USER = settings.SQL_USER
 SQL_PASSWORD = settings.SQL_PASSWORD
 
-if SQL_PASSWORD:
-    DATABASE_URL = f'mysql+pymysql://{SQL_USER}:{SQL_PASSWORD}@{SQL_HOST}/{SQL_DATABASE}'
+if settings.DATABASE_URL:
+    # e.g. sqlite+aiosqlite:///./fas.db for local testing and benchmarking
+    DATABASE_URL = settings.DATABASE_URL
+elif SQL_PASSWORD:
+    DATABASE_URL = f'mysql+aiomysql://{SQL_USER}:{SQL_PASSWORD}@{SQL_HOST}/{SQL_DATABASE}'
 else:
-    DATABASE_URL = f'mysql+pymysql://{SQL_USER}@{SQL_HOST}/{SQL_DATABASE}'
+    DATABASE_URL = f'mysql+aiomysql://{SQL_USER}@{SQL_HOST}/{SQL_DATABASE}'
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+_engine: Optional[AsyncEngine] = None
+_replica_engines: Optional[List[AsyncEngine]] = None
+_sessionmaker = async_sessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
+_read_sessionmaker = async_sessionmaker(class_=AsyncSession, sync_session_class=RoutingSession, autoflush=False,
+                                        expire_on_commit=False)
+replica_set = ReplicaSet()
 Base = declarative_base()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+def _create_engine(url: str, poolclass) -> AsyncEngine:
+    if url.startswith("sqlite"):
+        # SQLite picks its own pool (NullPool for files, StaticPool for :memory:)
+        return create_async_engine(url)
+    return create_async_engine(
+        url,
+        poolclass=poolclass,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+
+
+# The engine is created on first use, so importing the application loads no database driver and opens no connection
+def get_engine() -> AsyncEngine:
+    global _engine
+    if _engine is None:
+        _engine = _create_engine(DATABASE_URL, InstrumentedQueuePool)
+        install_pool_metrics(_engine.sync_engine)
+        install_query_stats(_engine.sync_engine)
+        _sessionmaker.configure(bind=_engine)
+    return _engine
+
+
+# Replica engines are created on first use as well, the pool statistics only cover the primary
+def _get_replica_engines() -> List[AsyncEngine]:
+    global _replica_engines
+    if _replica_engines is None:
+        _replica_engines = [_create_engine(url, AsyncAdaptedQueuePool) for url in settings.READ_REPLICA_URLS]
+        for engine in _replica_engines:
+            install_query_stats(engine.sync_engine)
+        replica_set.configure([engine.sync_engine for engine in _replica_engines],
+                              settings.READ_REPLICA_EJECT_SECONDS)
+    return _replica_engines
+
+
+async def dispose_engine():
+    global _engine, _replica_engines
+    if _replica_engines is not None:
+        for engine in _replica_engines:
+            await engine.dispose()
+        replica_set.clear()
+        _replica_engines = None
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+
+
+def new_session() -> AsyncSession:
+    get_engine()
+    return _sessionmaker()
+
+
+# A session for read-only work: its SELECTs go to a read replica when any are configured,
+# with primary_only (or after the session writes) everything goes to the primary
+def new_read_session(primary_only: bool = False) -> AsyncSession:
+    if not settings.READ_REPLICA_URLS:
+        return new_session()
+    _get_replica_engines()
+    return _read_sessionmaker(primary=get_engine().sync_engine, replicas=replica_set, force_primary=primary_only)
+
+
+async def get_db():
+    async with new_session() as db:
+        yield db
+
+
+# Clients send X-Read-Your-Writes: true on reads that must see their own recent writes, which replicas may lag behind
+def read_your_writes_requested(request: Request) -> bool:
+    return request.headers.get("x-read-your-writes", "").lower() in ("1", "true", "yes")
+
+
+async def get_read_db(primary_only: bool = Depends(read_your_writes_requested)):
+    async with new_read_session(primary_only) as db:
         yield db
-    finally:
-        db.close()
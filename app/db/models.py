@@ -1,7 +1,8 @@
 # Database Table Schema
 from typing import Optional
 
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, func, Float, Text, ForeignKey, Date, Enum, JSON, text
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, func, Float, Text, ForeignKey, Date, Enum, JSON, text, \
+    UniqueConstraint, Computed
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -37,6 +38,10 @@ class Household(Base):
     __tablename__ = 'households'
     id = Column(Integer, primary_key=True, index=True)
     address = Column(String(100))
+    # Maintained with the members: their number and the sorted distinct relation_to_applicant values,
+    # so eligibility can be decided from this row alone
+    member_count = Column(Integer, nullable=False, default=0, server_default=text('0'))
+    relationships = Column(JSON, nullable=True)
 
     members = relationship("HouseholdMember", back_populates="household")
 
@@ -45,7 +50,7 @@ class Household(Base):
 class HouseholdMember(Base):
     __tablename__ = 'household_members'
     id = Column(Integer, primary_key=True, index=True)
-    household_id = Column(Integer, ForeignKey('households.id'))
+    household_id = Column(Integer, ForeignKey('households.id'), index=True)
     person_id = Column(Integer, ForeignKey('persons.id'))
     relation_to_applicant = Column(String(20))
 
@@ -72,8 +77,8 @@ class Scheme(Base):
 class Applicant(Base):
     __tablename__ = 'applicants'
     id = Column(Integer, primary_key=True, index=True)
-    person_id = Column(Integer, ForeignKey('persons.id'))
-    household_id = Column(Integer, ForeignKey('households.id'))
+    person_id = Column(Integer, ForeignKey('persons.id'), index=True)
+    household_id = Column(Integer, ForeignKey('households.id'), index=True)
 
     person = relationship("Person")
     household = relationship("Household")
@@ -83,11 +88,17 @@ class Applicant(Base):
 # Tracks specific applications with their submission dates.
 class Application(Base):
     __tablename__ = 'applications'
+    # At most one pending application per applicant and scheme: pending_key is 1 for pending rows and NULL otherwise,
+    # and NULLs never collide in a unique index. Its applicant_id prefix also serves searches by applicant.
+    __table_args__ = (
+        UniqueConstraint('applicant_id', 'scheme_id', 'pending_key', name='uq_applications_pending'),
+    )
     id = Column(Integer, primary_key=True, index=True)
     applicant_id = Column(Integer, ForeignKey('applicants.id'))
     scheme_id = Column(Integer, ForeignKey('schemes.id'))
-    application_date = Column(DateTime, default=datetime.utcnow, server_default=text("CURRENT_TIMESTAMP"))
+    application_date = Column(DateTime, default=datetime.utcnow, server_default=text("CURRENT_TIMESTAMP"), index=True)
     status = Column(Enum(ApplicationStatus), default=ApplicationStatus.PENDING.value, server_default=text(f"'{ApplicationStatus.PENDING.value}'"))
+    pending_key = Column(Integer, Computed(f"CASE WHEN status = '{ApplicationStatus.PENDING.name}' THEN 1 END"))
 
     applicant = relationship("Applicant", back_populates="applications")
     scheme = relationship("Scheme", back_populates="applications")
@@ -103,3 +114,23 @@ class Benefit(Base):
     condition = Column(String(255), nullable=True)
 
     scheme = relationship("Scheme", back_populates="benefits")
+
+
+# Materialized eligibility: one row per applicant and scheme the applicant is eligible for, with the time it was
+# computed. Maintained by the eligibility refresh worker from eligibility_refresh_queue.
+class ApplicantSchemeEligibility(Base):
+    __tablename__ = 'applicant_scheme_eligibility'
+    applicant_id = Column(Integer, ForeignKey('applicants.id'), primary_key=True)
+    scheme_id = Column(Integer, ForeignKey('schemes.id'), primary_key=True, index=True)
+    computed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+# Pending eligibility refreshes, written in the same transaction as the change that causes them.
+# An entry names an applicant, a scheme, or neither for a full refresh.
+class EligibilityRefresh(Base):
+    __tablename__ = 'eligibility_refresh_queue'
+    id = Column(Integer, primary_key=True, index=True)
+    applicant_id = Column(Integer, nullable=True, index=True)
+    scheme_id = Column(Integer, nullable=True)
+    enqueued_at = Column(DateTime, nullable=False, default=datetime.utcnow,
+                         server_default=text("CURRENT_TIMESTAMP"))
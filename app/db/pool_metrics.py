@@ -0,0 +1,115 @@
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool
+
+from app.metrics import DB_POOL_CHECKOUT_TIMEOUTS, DB_POOL_CHECKOUT_WAIT, DB_POOL_CONNECTIONS_INVALIDATED, \
+    DB_POOL_CONNECTIONS_OPENED, DB_POOL_IN_USE
+
+
+# Connection pool statistics, updated from pool events and mirrored to the Prometheus metrics
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.checkout_waits = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+        self.in_use = 0
+        self.in_use_peak = 0
+        self.connections_opened = 0
+        self.connections_closed = 0
+        self.connections_invalidated = 0
+        self.connection_lifetime_total = 0.0
+        self.connection_lifetime_max = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.checkout_timeouts += 1
+            self.checkout_waits += 1
+            self.checkout_wait_total += seconds
+            self.checkout_wait_max = max(self.checkout_wait_max, seconds)
+        DB_POOL_CHECKOUT_WAIT.observe(seconds)
+        if timed_out:
+            DB_POOL_CHECKOUT_TIMEOUTS.inc()
+
+    def on_connect(self, dbapi_connection, connection_record):
+        connection_record.info["connected_at"] = time.monotonic()
+        with self._lock:
+            self.connections_opened += 1
+        DB_POOL_CONNECTIONS_OPENED.inc()
+
+    def on_close(self, dbapi_connection, connection_record):
+        connected_at = connection_record.info.pop("connected_at", None)
+        with self._lock:
+            self.connections_closed += 1
+            if connected_at is not None:
+                lifetime = time.monotonic() - connected_at
+                self.connection_lifetime_total += lifetime
+                self.connection_lifetime_max = max(self.connection_lifetime_max, lifetime)
+
+    def on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.connections_invalidated += 1
+        DB_POOL_CONNECTIONS_INVALIDATED.inc()
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.in_use_peak = max(self.in_use_peak, self.in_use)
+        DB_POOL_IN_USE.inc()
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.in_use -= 1
+        DB_POOL_IN_USE.dec()
+
+    def snapshot(self, pool: Pool) -> dict:
+        with self._lock:
+            closed = self.connections_closed
+            return {
+                "pool_class": type(pool).__name__,
+                "pool_size": pool.size() if hasattr(pool, "size") else None,
+                "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+                "checked_in": pool.checkedin() if hasattr(pool, "checkedin") else None,
+                "in_use": self.in_use,
+                "in_use_peak": self.in_use_peak,
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.checkout_timeouts,
+                "checkout_wait_avg_ms": self.checkout_wait_total / self.checkout_waits * 1000 if self.checkout_waits else 0.0,
+                "checkout_wait_max_ms": self.checkout_wait_max * 1000,
+                "connections_opened": self.connections_opened,
+                "connections_closed": closed,
+                "connections_invalidated": self.connections_invalidated,
+                "connection_lifetime_avg_s": self.connection_lifetime_total / closed if closed else 0.0,
+                "connection_lifetime_max_s": self.connection_lifetime_max,
+            }
+
+
+pool_stats = PoolStats()
+
+
+# Queue pool that records how long each checkout waited, including opening a new connection
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_stats.record_wait(time.perf_counter() - started)
+        return connection
+
+
+def install_pool_metrics(engine: Engine):
+    event.listen(engine, "connect", pool_stats.on_connect)
+    event.listen(engine, "close", pool_stats.on_close)
+    event.listen(engine, "invalidate", pool_stats.on_invalidate)
+    event.listen(engine, "checkout", pool_stats.on_checkout)
+    event.listen(engine, "checkin", pool_stats.on_checkin)
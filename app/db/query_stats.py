@@ -0,0 +1,60 @@
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# SQL statements executed while serving one request
+class RequestQueryStats:
+    def __init__(self, track_shapes: bool = False):
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement: Optional[str] = None
+        # Statement text -> executions, only kept when the N+1 detector is enabled
+        self.shapes: Optional[Counter] = Counter() if track_shapes else None
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.total_time += seconds
+        if seconds >= self.slowest_time:
+            self.slowest_time = seconds
+            self.slowest_statement = statement
+        if self.shapes is not None:
+            self.shapes[statement] += 1
+
+    # Statements executed at least threshold times, most repeated first
+    def repeated_statements(self, threshold: int):
+        if self.shapes is None:
+            return []
+        return [(statement, count) for statement, count in self.shapes.most_common() if count >= threshold]
+
+
+current_query_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started_at"].pop()
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started_at"):
+        connection.info["query_started_at"].pop()
+
+
+def install_query_stats(engine: Engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
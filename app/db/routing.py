@@ -0,0 +1,104 @@
+import threading
+import time
+from functools import partial
+from typing import List, Optional
+
+from sqlalchemy import Select, event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+
+# Read replicas, handed out round-robin. A replica that fails to connect or loses its connection is ejected for
+# eject_seconds and then tried again; while every replica is ejected, reads go to the primary.
+class ReplicaSet:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._engines: List[Engine] = []
+        self._ejected_until: List[float] = []
+        self._ejections: List[int] = []
+        self._sessions: List[int] = []
+        self._next = 0
+        self.eject_seconds = 30.0
+        self.primary_fallbacks = 0
+
+    def configure(self, engines: List[Engine], eject_seconds: float):
+        with self._lock:
+            self._engines = list(engines)
+            self._ejected_until = [0.0] * len(engines)
+            self._ejections = [0] * len(engines)
+            self._sessions = [0] * len(engines)
+            self._next = 0
+            self.eject_seconds = eject_seconds
+        for index, engine in enumerate(engines):
+            event.listen(engine, "handle_error", partial(self._on_error, index))
+
+    def clear(self):
+        self.configure([], self.eject_seconds)
+
+    def _on_error(self, index: int, exception_context):
+        if exception_context.is_disconnect or isinstance(exception_context.sqlalchemy_exception, exc.OperationalError):
+            self.eject(index)
+
+    def eject(self, index: int):
+        with self._lock:
+            if index < len(self._engines):
+                self._ejected_until[index] = time.monotonic() + self.eject_seconds
+                self._ejections[index] += 1
+
+    # The next healthy replica, None when there is none
+    def choose(self) -> Optional[Engine]:
+        with self._lock:
+            if not self._engines:
+                return None
+            now = time.monotonic()
+            for offset in range(len(self._engines)):
+                index = (self._next + offset) % len(self._engines)
+                if self._ejected_until[index] <= now:
+                    self._next = index + 1
+                    self._sessions[index] += 1
+                    return self._engines[index]
+            self.primary_fallbacks += 1
+            return None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "eject_seconds": self.eject_seconds,
+                "primary_fallbacks": self.primary_fallbacks,
+                "replicas": [
+                    {
+                        "url": engine.url.render_as_string(hide_password=True),
+                        "healthy": ejected_until <= now,
+                        "ejected_for_s": max(0.0, ejected_until - now),
+                        "ejections": ejections,
+                        "sessions": sessions,
+                    }
+                    for engine, ejected_until, ejections, sessions in zip(
+                        self._engines, self._ejected_until, self._ejections, self._sessions)
+                ],
+            }
+
+
+# Sends plain SELECTs to a replica chosen on the first read, everything else (flushes, INSERT/UPDATE/DELETE,
+# SELECT ... FOR UPDATE, textual SQL) to the primary. Once a session has written it stays on the primary,
+# so it reads its own writes; force_primary routes the whole session to the primary.
+class RoutingSession(Session):
+    def __init__(self, primary: Optional[Engine] = None, replicas: Optional[ReplicaSet] = None,
+                 force_primary: bool = False, **kw):
+        super().__init__(**kw)
+        self.primary = primary
+        self.replicas = replicas
+        self.use_primary = force_primary or replicas is None
+        self._replica: Optional[Engine] = None
+        self._replica_chosen = False
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if not self.use_primary:
+            if isinstance(clause, Select) and clause._for_update_arg is None and not self._flushing:
+                if not self._replica_chosen:
+                    self._replica = self.replicas.choose()
+                    self._replica_chosen = True
+                return self._replica or self.primary
+            self.use_primary = True
+        return self.primary
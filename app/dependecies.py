@@ -1,22 +1,28 @@
 import logging
+import time
 from datetime import timedelta, datetime
-from typing import Optional, Annotated
+from typing import Optional, Annotated, Literal
 
 from jose import JWTError, jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache import TTLCache
 from app.config.config import settings
 from app.db.database import get_db
 from app.db.models import Administrator
+from app.hashing import run_hashing
 from app.schema.auth_schema import TokenData
 
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# token -> Administrator, so authenticated requests skip the administrators lookup
+token_cache = TTLCache(maxsize=settings.AUTH_CACHE_MAX_SIZE, ttl=settings.AUTH_CACHE_TTL_SECONDS, name="auth_tokens")
 
 
 # Utility functions for hashing and verifying passwords
@@ -39,19 +45,23 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = db.query(Administrator).filter(Administrator.username == username).first()
-    if not user or not verify_password(password, user.hashed_password):
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = (await db.scalars(select(Administrator).where(Administrator.username == username))).first()
+    if not user or not await run_hashing(verify_password, password, user.hashed_password):
         return False
     return user
 
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: Session = Depends(get_db)):
+async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: AsyncSession = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    user = token_cache.get(token)
+    if user is not None:
+        return user
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -60,7 +70,16 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: Se
         token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = db.query(Administrator).filter(Administrator.username == token_data.username).first()
-    if user is None:
+    user = (await db.scalars(select(Administrator).where(Administrator.username == token_data.username))).first()
+    if user is None or not user.is_active:
         raise credentials_exception
+
+    # Never cache past the token's own expiry
+    expires_in = payload.get("exp", 0) - time.time()
+    token_cache.set(token, user, ttl=min(settings.AUTH_CACHE_TTL_SECONDS, expires_in))
     return user
+
+
+# Whether a collection endpoint should stream NDJSON, via ?stream=ndjson or an Accept: application/x-ndjson header
+def ndjson_requested(request: Request, stream: Optional[Literal["ndjson"]] = None) -> bool:
+    return stream == "ndjson" or "application/x-ndjson" in request.headers.get("accept", "")
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app.config.config import settings
+from app.config.logging_config import current_request_id
+from app.crud.eligibility_table import get_refresh_backlog, refresh_queued_eligibility
+from app.db.database import new_session
+from app.db.query_stats import current_query_stats
+from app.metrics import ELIGIBILITY_REFRESH_LAG, ELIGIBILITY_REFRESHES
+
+logger = logging.getLogger("myapp")
+
+
+# Background task, one per worker process, that drains eligibility_refresh_queue into applicant_scheme_eligibility.
+# It is started by the first notify(), when this process queues a refresh or reads eligibility while one is queued,
+# so idle workers never touch the queue. Once running it polls every ELIGIBILITY_REFRESH_INTERVAL_SECONDS and wakes
+# up right away on notify().
+class EligibilityRefresher:
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self.batches = 0
+        self.entries = 0
+        self.applicants = 0
+        self.schemes = 0
+        self.errors = 0
+        self.last_batch_at: Optional[datetime] = None
+        self.last_batch_time = 0.0
+        self.lag_seconds = 0.0
+
+    def start(self):
+        if self._task is None and settings.ELIGIBILITY_REFRESH_ENABLED:
+            self._task = asyncio.create_task(self._run(), name="eligibility-refresh")
+            logger.info("Eligibility refresh started")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self):
+        self.start()
+        self._wakeup.set()
+
+    async def _run(self):
+        # The task copied the context of the request that started it, whose ID and query stats it must not report to
+        current_request_id.set(None)
+        current_query_stats.set(None)
+        while True:
+            self._wakeup.clear()
+            try:
+                drained = await self.run_once()
+            except (IntegrityError, OperationalError) as e:
+                # Another worker wrote the same rows or a deadlock was detected, the entries stay queued
+                self.errors += 1
+                logger.warning("Eligibility refresh conflicted, retrying: %s", e.orig)
+                drained = True
+            except Exception:
+                self.errors += 1
+                logger.exception("Eligibility refresh failed")
+                drained = True
+            if drained:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), settings.ELIGIBILITY_REFRESH_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+    # Process one batch of the queue, True when it is drained
+    async def run_once(self) -> bool:
+        started = time.perf_counter()
+        async with new_session() as db:
+            counts = await refresh_queued_eligibility(db, settings.ELIGIBILITY_REFRESH_BATCH_SIZE)
+            await db.commit()
+            pending, oldest = await get_refresh_backlog(db)
+
+        self.lag_seconds = max(0.0, (datetime.utcnow() - oldest).total_seconds()) if oldest else 0.0
+        ELIGIBILITY_REFRESH_LAG.set(self.lag_seconds)
+        if counts["entries"]:
+            self.batches += 1
+            self.entries += counts["entries"]
+            self.applicants += counts["applicants"]
+            self.schemes += counts["schemes"]
+            self.last_batch_at = datetime.utcnow()
+            self.last_batch_time = time.perf_counter() - started
+            ELIGIBILITY_REFRESHES.labels("applicant").inc(counts["applicants"])
+            ELIGIBILITY_REFRESHES.labels("scheme").inc(counts["schemes"])
+            logger.debug("Eligibility refresh: %d entries, %d applicants, %d schemes in %.1fms, %d pending",
+                         counts["entries"], counts["applicants"], counts["schemes"], self.last_batch_time * 1000,
+                         pending)
+        return pending == 0 or not counts["entries"]
+
+    def snapshot(self) -> dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "batches": self.batches,
+            "entries": self.entries,
+            "applicants": self.applicants,
+            "schemes": self.schemes,
+            "errors": self.errors,
+            "last_batch_at": self.last_batch_at.isoformat() if self.last_batch_at else None,
+            "last_batch_ms": self.last_batch_time * 1000,
+            "lag_seconds": self.lag_seconds,
+        }
+
+
+eligibility_refresher = EligibilityRefresher()
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from fastapi import HTTPException, status
+
+from app.config.config import settings
+
+T = TypeVar("T")
+
+
+# Latency and queueing counters for password hashing
+class HashingStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.run_time_total = 0.0
+        self.run_time_max = 0.0
+
+    # Reserve a slot on the pool, False when workers and queue are all taken
+    def try_enter(self) -> bool:
+        with self._lock:
+            if self.pending >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_MAX_QUEUE:
+                self.rejected += 1
+                return False
+            self.pending += 1
+            return True
+
+    def leave(self):
+        with self._lock:
+            self.pending -= 1
+
+    def record(self, queue_wait: float, run_time: float):
+        with self._lock:
+            self.completed += 1
+            self.queue_wait_total += queue_wait
+            self.queue_wait_max = max(self.queue_wait_max, queue_wait)
+            self.run_time_total += run_time
+            self.run_time_max = max(self.run_time_max, run_time)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            completed = self.completed
+            return {
+                "workers": settings.PASSWORD_HASH_WORKERS,
+                "max_queue": settings.PASSWORD_HASH_MAX_QUEUE,
+                "pending": self.pending,
+                "completed": completed,
+                "rejected": self.rejected,
+                "queue_wait_avg_ms": self.queue_wait_total / completed * 1000 if completed else 0.0,
+                "queue_wait_max_ms": self.queue_wait_max * 1000,
+                "run_time_avg_ms": self.run_time_total / completed * 1000 if completed else 0.0,
+                "run_time_max_ms": self.run_time_max * 1000,
+            }
+
+
+hashing_stats = HashingStats()
+# bcrypt releases the GIL, so a small thread pool gives real parallelism without blocking the event loop
+_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+
+
+# Run a password hashing/verification function on the hashing pool.
+# Requests beyond the worker count queue up to PASSWORD_HASH_MAX_QUEUE, after which they are shed with a 503
+# so a login storm only degrades the login endpoint.
+async def run_hashing(func: Callable[..., T], *args) -> T:
+    if not hashing_stats.try_enter():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent authentication requests, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+    submitted = time.perf_counter()
+
+    def timed():
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            hashing_stats.record(started - submitted, time.perf_counter() - started)
+
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, timed)
+    finally:
+        hashing_stats.leave()
@@ -0,0 +1,78 @@
+# Prometheus metrics.
+# With PROMETHEUS_MULTIPROC_DIR set (an empty directory shared by all uvicorn workers, cleared before they start),
+# every worker writes its samples to memory mapped files there and /metrics aggregates all of them.
+import os
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, \
+    generate_latest
+from prometheus_client import multiprocess
+
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+HTTP_REQUESTS = Counter(
+    "fas_http_requests_total", "HTTP requests by route template and status code.", ["method", "route", "status"])
+HTTP_REQUEST_DURATION = Histogram(
+    "fas_http_request_duration_seconds", "Time until the response was fully sent, by route template.",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "fas_http_requests_in_flight", "Requests currently being served.", multiprocess_mode="livesum")
+
+DB_POOL_IN_USE = Gauge(
+    "fas_db_pool_connections_in_use", "Database connections checked out of the pool.", multiprocess_mode="livesum")
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "fas_db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection, including connecting.",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0))
+DB_POOL_CHECKOUT_TIMEOUTS = Counter(
+    "fas_db_pool_checkout_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT.")
+DB_POOL_CONNECTIONS_OPENED = Counter("fas_db_pool_connections_opened_total", "Database connections opened.")
+DB_POOL_CONNECTIONS_INVALIDATED = Counter(
+    "fas_db_pool_connections_invalidated_total", "Database connections invalidated after an error.")
+
+# Hit ratio: rate(fas_cache_requests_total{result="hit"}) / rate(fas_cache_requests_total)
+CACHE_REQUESTS = Counter("fas_cache_requests_total", "In-process cache lookups by cache and result.",
+                         ["cache", "result"])
+
+
+ELIGIBILITY_REFRESH_LAG = Gauge(
+    "fas_eligibility_refresh_lag_seconds", "Age of the oldest queued eligibility refresh.",
+    multiprocess_mode="livemax")
+ELIGIBILITY_REFRESHES = Counter(
+    "fas_eligibility_refreshes_total", "Applicants and schemes whose materialized eligibility was recomputed.",
+    ["kind"])
+
+
+# Labelled children are cached so the request path does a dict lookup instead of going through labels()
+class _RequestMetrics:
+    def __init__(self):
+        self._counters = {}
+        self._histograms = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float):
+        key = (method, route, status)
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters[key] = HTTP_REQUESTS.labels(method, route, str(status))
+        counter.inc()
+        key = (method, route)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = HTTP_REQUEST_DURATION.labels(method, route)
+        histogram.observe(seconds)
+
+
+request_metrics = _RequestMetrics()
+
+
+def render_metrics():
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+# Drop the live gauges of this worker when it shuts down
+def mark_worker_dead():
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
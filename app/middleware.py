@@ -0,0 +1,109 @@
+import logging
+import time
+import uuid
+
+from app.config.config import settings
+from app.config.logging_config import current_request_id
+from app.db.query_stats import RequestQueryStats, current_query_stats
+from app.metrics import HTTP_REQUESTS_IN_FLIGHT, request_metrics
+
+logger = logging.getLogger("myapp")
+
+
+# Tags every log line of a request with its ID, taken from the X-Request-ID header or generated, and echoes it back
+class RequestIdMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:200]
+                break
+        if not request_id:
+            request_id = uuid.uuid4().hex
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode())]
+            await send(message)
+
+        token = current_request_id.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            current_request_id.reset(token)
+
+
+# Records the SQL statements of each request. The totals up to the start of the response are sent in a
+# Server-Timing header, the totals for the whole request (including streamed bodies) go to a debug log line.
+# With SQL_N_PLUS_ONE_THRESHOLD set, statements repeated that often within one request are logged as warnings.
+class QueryStatsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        threshold = settings.SQL_N_PLUS_ONE_THRESHOLD
+        stats = RequestQueryStats(track_shapes=threshold > 0)
+        token = current_query_stats.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and settings.SERVER_TIMING_HEADER:
+                elapsed = time.perf_counter() - started
+                timing = 'db;dur=%.1f;desc="%d queries", db-slowest;dur=%.1f, app;dur=%.1f' % (
+                    stats.total_time * 1000, stats.count, stats.slowest_time * 1000, elapsed * 1000)
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_query_stats.reset(token)
+            path = "%s %s" % (scope["method"], scope["path"])
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("%s: %d statements, db %.1fms, slowest %.1fms, total %.1fms%s", path, stats.count,
+                             stats.total_time * 1000, stats.slowest_time * 1000,
+                             (time.perf_counter() - started) * 1000,
+                             ": %s" % stats.slowest_statement[:200] if stats.slowest_statement else "")
+            for statement, count in stats.repeated_statements(threshold):
+                logger.warning("Possible N+1 in %s: statement executed %d times: %s", path, count, statement[:500])
+
+
+# Counts requests and their latency per route template (the path as declared, so IDs do not create new series)
+# and tracks the number of requests in flight. Unmatched paths are grouped under a single route label.
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            request_metrics.observe(scope["method"], route.path if route is not None else "unmatched", status,
+                                    time.perf_counter() - started)
@@ -1,17 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+import tempfile
 
-from typing import List, Annotated
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from typing import List, Annotated, Optional
+
+from app.config.config import settings
 from app.crud.applicant_table import create_applicant, get_applicant_by_id, update_applicant, delete_applicant, \
-    list_applicants
-from app.db.database import get_db
-from app.dependecies import get_current_user
-from app.schema.applicant_schema import ApplicantResponse, ApplicantCreate, ApplicantUpdate
+    list_applicants, create_applicants, iter_applicants, delete_applicants
+from app.db.database import get_db, get_read_db, new_read_session, read_your_writes_requested
+from app.db.models import Applicant
+from app.dependecies import get_current_user, ndjson_requested
+from app.enums import EmploymentStatus, MaritalStatus
+from app.schema.applicant_schema import ApplicantResponse, ApplicantCreate, ApplicantUpdate, ApplicantBulkDelete
 from app.schema.auth_schema import User
+from app.schema.mappers import applicant_to_dict
 
 router = APIRouter()
 
+# Import results are spooled to disk past this size
+IMPORT_RESULT_SPOOL_SIZE = 1024 * 1024
+
+
+def _applicant_ndjson(applicant: Applicant) -> bytes:
+    return orjson.dumps(applicant_to_dict(applicant)) + b"\n"
+
 
 @router.post(
     "/api/applicants",
@@ -19,19 +35,9 @@ router = APIRouter()
     description="Create a new applicant.",
     tags=["Applicants"]
 )
-async def create_new_applicant(current_user: Annotated[User, Depends(get_current_user)], applicant: ApplicantCreate, db: Session = Depends(get_db)):
-    new_applicant = create_applicant(db, applicant)
-    response_data = {
-        "id": new_applicant.id,
-        "name": new_applicant.person.name,
-        "ic_number": new_applicant.person.ic_number,
-        "date_of_birth": new_applicant.person.date_of_birth,
-        "sex": new_applicant.person.sex,
-        "employment_status": new_applicant.person.employment_status,
-        "marital_status": new_applicant.person.marital_status,
-        "household_id": new_applicant.household_id
-    }
-    return response_data
+async def create_new_applicant(current_user: Annotated[User, Depends(get_current_user)], applicant: ApplicantCreate, db: AsyncSession = Depends(get_db)):
+    new_applicant = await create_applicant(db, applicant)
+    return ORJSONResponse(applicant_to_dict(new_applicant))
 
 
 @router.get(
@@ -40,21 +46,11 @@ async def create_new_applicant(current_user: Annotated[User, Depends(get_current
     description="Retrieve an applicant by their ID.",
     tags=["Applicants"]
 )
-async def get_single_applicant(current_user: Annotated[User, Depends(get_current_user)], applicant_id: int, db: Session = Depends(get_db)):
-    applicant = get_applicant_by_id(db, applicant_id)
+async def get_single_applicant(current_user: Annotated[User, Depends(get_current_user)], applicant_id: int, db: AsyncSession = Depends(get_db)):
+    applicant = await get_applicant_by_id(db, applicant_id)
     if not applicant:
         raise HTTPException(status_code=404, detail="Applicant not found")
-    response_data = {
-        "id": applicant.id,
-        "name": applicant.person.name,
-        "ic_number": applicant.person.ic_number,
-        "date_of_birth": applicant.person.date_of_birth,
-        "sex": applicant.person.sex,
-        "employment_status": applicant.person.employment_status,
-        "marital_status": applicant.person.marital_status,
-        "household_id": applicant.household_id
-    }
-    return response_data
+    return ORJSONResponse(applicant_to_dict(applicant))
 
 
 @router.put(
@@ -64,56 +60,143 @@ async def get_single_applicant(current_user: Annotated[User, Depends(get_current
     tags=["Applicants"]
 )
 async def update_existing_applicant(current_user: Annotated[User, Depends(get_current_user)], applicant_id: int, applicant_update: ApplicantUpdate,
-                                    db: Session = Depends(get_db)):
-    updated_applicant = update_applicant(db, applicant_id, applicant_update)
+                                    db: AsyncSession = Depends(get_db)):
+    updated_applicant = await update_applicant(db, applicant_id, applicant_update)
     if not updated_applicant:
         raise HTTPException(status_code=404, detail="Applicant not found")
-    response_data = {
-        "id": updated_applicant.id,
-        "name": updated_applicant.person.name,
-        "ic_number": updated_applicant.person.ic_number,
-        "date_of_birth": updated_applicant.person.date_of_birth,
-        "sex": updated_applicant.person.sex,
-        "employment_status": updated_applicant.person.employment_status,
-        "marital_status": updated_applicant.person.marital_status,
-        "household_id": updated_applicant.household_id
-    }
-    return response_data
+    return ORJSONResponse(applicant_to_dict(updated_applicant))
 
 
 @router.delete(
     "/api/applicants/{applicant_id}",
     status_code=status.HTTP_204_NO_CONTENT,
-    description="Delete an applicant by their ID.",
+    description="Delete an applicant by their ID, together with their applications and their household.",
     tags=["Applicants"]
 )
-async def delete_existing_applicant(current_user: Annotated[User, Depends(get_current_user)], applicant_id: int, db: Session = Depends(get_db)):
-    applicant = delete_applicant(db, applicant_id)
-    if not applicant:
+async def delete_existing_applicant(current_user: Annotated[User, Depends(get_current_user)], applicant_id: int, db: AsyncSession = Depends(get_db)):
+    if not await delete_applicant(db, applicant_id):
         raise HTTPException(status_code=404, detail="Applicant not found")
     return
 
 
+@router.post(
+    "/api/applicants/bulk-delete",
+    description="""
+    Delete many applicants at once, e.g. to purge a data retention cohort, together with their applications and the
+    households (and household members) no remaining applicant belongs to. Applicants are deleted in chunks, each in its
+    own transaction. The response holds the number of rows removed from each table; unknown IDs are skipped.
+    """,
+    tags=["Applicants"]
+)
+async def bulk_delete_applicants(current_user: Annotated[User, Depends(get_current_user)],
+                                 bulk_delete: ApplicantBulkDelete, db: AsyncSession = Depends(get_db)):
+    if len(bulk_delete.applicant_ids) > settings.APPLICANT_DELETE_MAX_ITEMS:
+        raise HTTPException(status_code=400,
+                            detail=f"At most {settings.APPLICANT_DELETE_MAX_ITEMS} applicants can be deleted at once")
+    counts = await delete_applicants(db, bulk_delete.applicant_ids, settings.APPLICANT_DELETE_CHUNK_SIZE)
+    return ORJSONResponse({"requested": len(set(bulk_delete.applicant_ids)), **counts})
+
+
 @router.get(
     "/api/applicants",
     response_model=List[ApplicantResponse],
-    description="Retrieve a list of all applicants.",
+    description="""
+    Retrieve a page of applicants ordered by ID, optionally filtered by employment and marital status.
+    Pass the `X-Next-After-Id` response header back as `after_id` to fetch the next page.
+    With `?stream=ndjson` or `Accept: application/x-ndjson`, every matching applicant is streamed as newline-delimited JSON
+    and `limit` is ignored.
+    """,
     tags=["Applicants"]
 )
-async def list_all_applicants(current_user: Annotated[User, Depends(get_current_user)], db: Session = Depends(get_db)):
-    applicants = list_applicants(db)
-
-    response_data = []
-    for applicant in applicants:
-        response_data.append({
-            "id": applicant.id,
-            "name": applicant.person.name,
-            "ic_number": applicant.person.ic_number,
-            "date_of_birth": applicant.person.date_of_birth,
-            "sex": applicant.person.sex,
-            "employment_status": applicant.person.employment_status,
-            "marital_status": applicant.person.marital_status,
-            "household_id": applicant.household_id
-        })
-
-    return response_data
+async def list_all_applicants(current_user: Annotated[User, Depends(get_current_user)],
+                              after_id: Optional[int] = None,
+                              limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+                              employment_status: Optional[EmploymentStatus] = None,
+                              marital_status: Optional[MaritalStatus] = None,
+                              stream_ndjson: bool = Depends(ndjson_requested),
+                              primary_only: bool = Depends(read_your_writes_requested),
+                              db: AsyncSession = Depends(get_read_db)):
+    if stream_ndjson:
+        # The stream outlives the request scoped session, so it reads through its own
+        async def generate():
+            async with new_read_session(primary_only) as stream_db:
+                async for applicant in iter_applicants(stream_db, settings.STREAM_YIELD_PER, after_id,
+                                                       employment_status, marital_status):
+                    yield _applicant_ndjson(applicant)
+
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+    applicants = await list_applicants(db, after_id, limit, employment_status, marital_status)
+    headers = {"X-Next-After-Id": str(applicants[-1].id)} if len(applicants) == limit else None
+    return ORJSONResponse([applicant_to_dict(applicant) for applicant in applicants], headers=headers)
+
+
+@router.post(
+    "/api/applicants/import",
+    description="""
+    Bulk import applicants from a newline-delimited JSON body, one `ApplicantCreate` object per line.
+    Rows are written in batches of `batch_size`. The response is newline-delimited JSON with one line per input line,
+    holding either the new applicant `id` or the `error` for that line.
+    """,
+    tags=["Applicants"]
+)
+async def import_applicants(current_user: Annotated[User, Depends(get_current_user)], request: Request,
+                            batch_size: int = Query(settings.APPLICANT_IMPORT_BATCH_SIZE, ge=1, le=10000),
+                            db: AsyncSession = Depends(get_db)):
+    # Results are spooled instead of streamed while reading, as the response cannot start before the body is consumed
+    results = tempfile.SpooledTemporaryFile(max_size=IMPORT_RESULT_SPOOL_SIZE)
+    batch = []  # (line number, ApplicantCreate or validation errors)
+
+    async def write_batch():
+        valid = [(line_number, item) for line_number, item in batch if isinstance(item, ApplicantCreate)]
+        outcomes = {}
+        if valid:
+            try:
+                created = await create_applicants(db, [applicant for _, applicant in valid])
+                outcomes = {line_number: {"id": new_applicant.id}
+                            for (line_number, _), new_applicant in zip(valid, created)}
+            except Exception:
+                # Retry the batch row by row so one bad row does not fail its neighbours
+                for line_number, applicant in valid:
+                    try:
+                        outcomes[line_number] = {"id": (await create_applicant(db, applicant)).id}
+                    except Exception as exc:
+                        outcomes[line_number] = {"error": str(getattr(exc, "orig", exc))}
+
+        for line_number, item in batch:
+            result = outcomes.get(line_number, {"error": item})
+            results.write(orjson.dumps({"line": line_number, **result}) + b"\n")
+        batch.clear()
+
+    async def add_line(line_number: int, line: bytes):
+        if not line.strip():
+            return
+        try:
+            batch.append((line_number, ApplicantCreate.model_validate_json(line)))
+        except ValidationError as exc:
+            batch.append((line_number, exc.errors(include_url=False, include_context=False, include_input=False)))
+        if len(batch) >= batch_size:
+            await write_batch()
+
+    line_number = 0
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            await add_line(line_number, line)
+    if buffer:
+        line_number += 1
+        await add_line(line_number, buffer)
+    await write_batch()
+
+    def stream_results():
+        try:
+            results.seek(0)
+            while chunk := results.read(64 * 1024):
+                yield chunk
+        finally:
+            results.close()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
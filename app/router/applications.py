@@ -1,18 +1,33 @@
-from typing import Annotated, List
-
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-
-from app.crud.application_table import create_application, get_application_by_id, update_application, delete_application, list_applications
-from app.db.database import get_db
-from app.db.models import Scheme, Applicant, HouseholdMember, Application
-from app.dependecies import get_current_user
+from datetime import datetime
+from typing import Annotated, List, Optional
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.config import settings
+from app.crud.application_table import create_application, get_application_by_id, update_application, delete_application, list_applications, \
+    iter_applications, get_application_validation_row, is_pending_conflict, search_applications, \
+    bulk_update_application_status, bulk_update_application_status_by_filter, BULK_STATUS_TRANSITIONS
+from app.db.database import get_db, get_read_db, new_session
+from app.db.models import Application
+from app.dependecies import get_current_user, ndjson_requested
 from app.enums import ApplicationStatus
 from app.schema.auth_schema import User
-from app.schema.application_schema import ApplicationResponse, ApplicationCreate, ApplicationUpdate
+from app.schema.application_schema import ApplicationResponse, ApplicationCreate, ApplicationUpdate, \
+    ApplicationBulkStatusUpdate
+from app.schema.mappers import application_to_dict
 
 router = APIRouter()
 
+DUPLICATE_PENDING_DETAIL = "An application for this scheme by the same applicant already exists and is still pending."
+
+
+def _application_ndjson(application: Application) -> bytes:
+    return orjson.dumps(application_to_dict(application)) + b"\n"
+
 
 @router.post(
     "/api/applications",
@@ -21,70 +36,125 @@ router = APIRouter()
     tags=["Applications"]
 )
 async def create_new_application(current_user: Annotated[User, Depends(get_current_user)], application: ApplicationCreate,
-                                 db: Session = Depends(get_db)):
+                                 db: AsyncSession = Depends(get_db)):
+    row = await get_application_validation_row(db, application.applicant_id, application.scheme_id)
+
     # Check if the applicant exists
-    applicant = db.query(Applicant).filter(Applicant.id == application.applicant_id).first()
-    if not applicant:
+    if row is None:
         raise HTTPException(status_code=404, detail="Applicant not found")
 
     # Check if the scheme exists
-    scheme = db.query(Scheme).filter(Scheme.id == application.scheme_id).first()
-    if not scheme:
+    if row.scheme_id is None:
         raise HTTPException(status_code=404, detail="Scheme not found")
 
     # Check for existing application with the same scheme and applicant
-    existing_application = db.query(Application).filter(
-        Application.applicant_id == application.applicant_id,
-        Application.scheme_id == application.scheme_id,
-        Application.status.in_([ApplicationStatus.PENDING.value])  # Only check for 'Pending' status
-    ).first()
-
-    if existing_application:
-        raise HTTPException(status_code=400,
-                            detail="An application for this scheme by the same applicant already exists and is still pending.")
+    if row.has_pending:
+        raise HTTPException(status_code=400, detail=DUPLICATE_PENDING_DETAIL)
 
     # Check eligibility based on the scheme's criteria
-    if scheme.marital_status_required and scheme.marital_status_required != applicant.person.marital_status:
+    if row.marital_status_required and row.marital_status_required != row.marital_status:
         raise HTTPException(status_code=400,
                             detail="Applicant does not meet the marital status requirement for this scheme")
 
-    if scheme.employment_status_required and scheme.employment_status_required != applicant.person.employment_status:
+    if row.employment_status_required and row.employment_status_required != row.employment_status:
         raise HTTPException(status_code=400,
                             detail="Applicant does not meet the employment status requirement for this scheme")
 
-    if scheme.household_size and scheme.household_size > len(applicant.household.members) + 1:
+    if row.household_size and row.household_size > (row.member_count or 0) + 1:
         raise HTTPException(status_code=400,
                             detail="Applicant's household size does not meet the requirement for this scheme")
 
-    if scheme.required_relationships:
-        household_members = db.query(HouseholdMember).filter(
-            HouseholdMember.household_id == applicant.household_id).all()
-        relationships = [member.relation_to_applicant for member in household_members]
+    if row.required_relationships:
+        relationships = row.relationships or []
 
-        for required_relationship in scheme.required_relationships:
+        for required_relationship in row.required_relationships:
             if required_relationship not in relationships:
                 raise HTTPException(status_code=400,
                                     detail=f"Applicant does not have the required relationship: {required_relationship}")
 
-    return create_application(db, application)
+    try:
+        new_application = await create_application(db, application)
+    except IntegrityError as e:
+        # Another request created the same pending application after the check above
+        if not is_pending_conflict(e):
+            raise
+        raise HTTPException(status_code=400, detail=DUPLICATE_PENDING_DETAIL)
+    return ORJSONResponse(application_to_dict(new_application))
+
+
+@router.post(
+    "/api/applications/bulk-status",
+    description="""
+    Move many applications to a new status at once, e.g. to approve or reject a batch after review.
+    Select them by `application_ids` or by `filter`, in which case the matching applications that can make the
+    transition are updated. Only pending applications can be approved or rejected. The response holds the outcome for
+    every application: `updated`, `unchanged` (already in that status), `invalid_transition` or `not_found`.
+    A filter needs at least one criterion and updates at most `BULK_STATUS_MAX_ITEMS` applications; `truncated` is
+    true when more matching applications are left, repeat the request to update them.
+    """,
+    tags=["Applications"]
+)
+async def bulk_update_status(bulk_update: ApplicationBulkStatusUpdate,
+                             current_user: Annotated[User, Depends(get_current_user)],
+                             db: AsyncSession = Depends(get_db)):
+    if bulk_update.status not in BULK_STATUS_TRANSITIONS:
+        raise HTTPException(status_code=400,
+                            detail=f"Applications cannot be moved to {bulk_update.status.value} in bulk")
+
+    if bulk_update.application_ids is not None:
+        if len(bulk_update.application_ids) > settings.BULK_STATUS_MAX_ITEMS:
+            raise HTTPException(status_code=400,
+                                detail=f"At most {settings.BULK_STATUS_MAX_ITEMS} applications can be updated at once")
+        results = await bulk_update_application_status(db, bulk_update.application_ids, bulk_update.status,
+                                                        settings.BULK_STATUS_CHUNK_SIZE)
+        truncated = False
+    else:
+        criteria = bulk_update.filter
+        results, truncated = await bulk_update_application_status_by_filter(
+            db, bulk_update.status, criteria.scheme_id, criteria.applicant_id, criteria.date_from, criteria.date_to,
+            settings.BULK_STATUS_MAX_ITEMS, settings.BULK_STATUS_CHUNK_SIZE)
+
+    counts = {"updated": 0, "unchanged": 0, "invalid_transition": 0, "not_found": 0}
+    for _, outcome, _ in results:
+        counts[outcome] += 1
+    return ORJSONResponse({
+        "status": bulk_update.status.value,
+        **counts,
+        "truncated": truncated,
+        "results": [
+            {"id": application_id, "outcome": outcome, "status": status.value if status else None}
+            for application_id, outcome, status in results
+        ],
+    })
 
 
 @router.get(
     "/api/applications/search",
     response_model=List[ApplicationResponse],
-    description="Search for applications by applicant ID.",
+    description="""
+    Search for applications by any combination of applicant ID, applicant name prefix, applicant IC number, status,
+    scheme and submission date range. Results are ordered by ID and paginated with `offset` and `limit`, the
+    `X-Total-Count` response header holds the total number of matches.
+    """,
     tags=["Applications"]
 )
-async def search_applications_by_applicant_id(
+async def search_applications_by_criteria(
         current_user: Annotated[User, Depends(get_current_user)],
-        applicant_id: int,
-        db: Session = Depends(get_db)
+        applicant_id: Optional[int] = None,
+        name: Optional[str] = Query(None, min_length=1, max_length=50, description="Prefix of the applicant's name."),
+        ic_number: Optional[str] = Query(None, max_length=9),
+        status: Optional[ApplicationStatus] = None,
+        scheme_id: Optional[int] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        offset: int = Query(0, ge=0),
+        limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+        db: AsyncSession = Depends(get_read_db)
 ):
-    applications = db.query(Application).filter(Application.applicant_id == applicant_id).all()
-    if not applications:
-        raise HTTPException(status_code=404, detail="No applications found for this applicant.")
-
-    return applications
+    applications, total = await search_applications(db, applicant_id, name, ic_number, status, scheme_id, date_from,
+                                                    date_to, offset, limit)
+    return ORJSONResponse([application_to_dict(application) for application in applications],
+                          headers={"X-Total-Count": str(total)})
 
 
 @router.get(
@@ -94,11 +164,11 @@ async def search_applications_by_applicant_id(
     tags=["Applications"]
 )
 async def read_application(application_id: int, current_user: Annotated[User, Depends(get_current_user)],
-                           db: Session = Depends(get_db)):
-    application = get_application_by_id(db, application_id)
+                           db: AsyncSession = Depends(get_read_db)):
+    application = await get_application_by_id(db, application_id)
     if application is None:
         raise HTTPException(status_code=404, detail="Application not found")
-    return application
+    return ORJSONResponse(application_to_dict(application))
 
 
 @router.put(
@@ -109,11 +179,16 @@ async def read_application(application_id: int, current_user: Annotated[User, De
 )
 async def update_existing_application(application_id: int, application_update: ApplicationUpdate,
                                       current_user: Annotated[User, Depends(get_current_user)],
-                                      db: Session = Depends(get_db)):
-    updated_application = update_application(db, application_id, application_update)
+                                      db: AsyncSession = Depends(get_db)):
+    try:
+        updated_application = await update_application(db, application_id, application_update)
+    except IntegrityError as e:
+        if not is_pending_conflict(e):
+            raise
+        raise HTTPException(status_code=400, detail=DUPLICATE_PENDING_DETAIL)
     if updated_application is None:
         raise HTTPException(status_code=404, detail="Application not found")
-    return updated_application
+    return ORJSONResponse(application_to_dict(updated_application))
 
 
 @router.delete(
@@ -123,8 +198,8 @@ async def update_existing_application(application_id: int, application_update: A
     tags=["Applications"]
 )
 async def delete_existing_application(application_id: int, current_user: Annotated[User, Depends(get_current_user)],
-                                      db: Session = Depends(get_db)):
-    application = delete_application(db, application_id)
+                                      db: AsyncSession = Depends(get_db)):
+    application = await delete_application(db, application_id)
     if application is None:
         raise HTTPException(status_code=404, detail="Application not found")
     return
@@ -133,8 +208,34 @@ async def delete_existing_application(application_id: int, current_user: Annotat
 @router.get(
     "/api/applications",
     response_model=List[ApplicationResponse],
-    description="Retrieve a list of all applications.",
+    description="""
+    Retrieve a page of applications ordered by ID, optionally filtered by status, scheme, applicant and submission date.
+    Pass the `X-Next-After-Id` response header back as `after_id` to fetch the next page.
+    With `?stream=ndjson` or `Accept: application/x-ndjson`, every matching application is streamed as newline-delimited
+    JSON and `limit` is ignored.
+    """,
     tags=["Applications"]
 )
-async def list_all_applications(current_user: Annotated[User, Depends(get_current_user)], db: Session = Depends(get_db)):
-    return list_applications(db)
+async def list_all_applications(current_user: Annotated[User, Depends(get_current_user)],
+                                after_id: Optional[int] = None,
+                                limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+                                status: Optional[ApplicationStatus] = None,
+                                scheme_id: Optional[int] = None,
+                                applicant_id: Optional[int] = None,
+                                date_from: Optional[datetime] = None,
+                                date_to: Optional[datetime] = None,
+                                stream_ndjson: bool = Depends(ndjson_requested),
+                                db: AsyncSession = Depends(get_db)):
+    if stream_ndjson:
+        # The stream outlives the request scoped session, so it reads through its own
+        async def generate():
+            async with new_session() as stream_db:
+                async for application in iter_applications(stream_db, settings.STREAM_YIELD_PER, after_id, status,
+                                                           scheme_id, applicant_id, date_from, date_to):
+                    yield _application_ndjson(application)
+
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+    applications = await list_applications(db, after_id, limit, status, scheme_id, applicant_id, date_from, date_to)
+    headers = {"X-Next-After-Id": str(applications[-1].id)} if len(applications) == limit else None
+    return ORJSONResponse([application_to_dict(application) for application in applications], headers=headers)
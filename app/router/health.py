@@ -0,0 +1,34 @@
+import logging
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+
+from app.db.database import new_session
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+@router.get(
+    "/health/live",
+    description="Liveness probe. Answers as soon as the process is serving requests and never touches the database.",
+    tags=["Health"]
+)
+async def live():
+    return {"status": "ok"}
+
+
+@router.get(
+    "/health/ready",
+    description="Readiness probe. Answers 200 once the database accepts a query, 503 otherwise.",
+    tags=["Health"]
+)
+async def ready():
+    try:
+        async with new_session() as db:
+            await db.execute(text("SELECT 1"))
+    except Exception as e:
+        logger.warning("Readiness check failed: %s", e)
+        return JSONResponse(status_code=503, content={"status": "unavailable"})
+    return {"status": "ok"}
@@ -0,0 +1,75 @@
+from typing import Annotated
+
+from datetime import datetime
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.eligibility_table import get_refresh_backlog
+from app.crud.scheme_catalog import scheme_catalog
+from app.db.database import get_db, get_engine, replica_set
+from app.db.pool_metrics import pool_stats
+from app.dependecies import get_current_user, token_cache
+from app.eligibility_refresher import eligibility_refresher
+from app.hashing import hashing_stats
+from app.schema.auth_schema import User
+
+router = APIRouter()
+
+
+@router.get(
+    "/internal/stats/db-pool",
+    description="Connection pool statistics for this worker: checkout wait times, connections in use and overflow, and connection lifetimes.",
+    tags=["Internal"]
+)
+async def read_db_pool_stats(current_user: Annotated[User, Depends(get_current_user)]):
+    return pool_stats.snapshot(get_engine().sync_engine.pool)
+
+
+@router.get(
+    "/internal/stats/read-replicas",
+    description="Health of the read replicas of this worker: ejections, sessions routed to each, and reads that fell back to the primary.",
+    tags=["Internal"]
+)
+async def read_replica_stats(current_user: Annotated[User, Depends(get_current_user)]):
+    return replica_set.snapshot()
+
+
+@router.get(
+    "/internal/stats/caches",
+    description="Size and hit/miss counters of the in-process caches of this worker.",
+    tags=["Internal"]
+)
+async def read_cache_stats(current_user: Annotated[User, Depends(get_current_user)]):
+    return {
+        "auth_tokens": token_cache.stats(),
+        "scheme_catalog": scheme_catalog.stats(),
+    }
+
+
+@router.get(
+    "/internal/stats/password-hashing",
+    description="Queueing and latency of bcrypt hashing and verification on this worker.",
+    tags=["Internal"]
+)
+async def read_password_hashing_stats(current_user: Annotated[User, Depends(get_current_user)]):
+    return hashing_stats.snapshot()
+
+
+@router.get(
+    "/internal/stats/eligibility-refresh",
+    description="""
+    Backlog of the materialized eligibility table: queued refreshes, the age of the oldest one,
+    and the batches processed by the refresh task of this worker.
+    """,
+    tags=["Internal"]
+)
+async def read_eligibility_refresh_stats(current_user: Annotated[User, Depends(get_current_user)],
+                                         db: AsyncSession = Depends(get_db)):
+    pending, oldest = await get_refresh_backlog(db)
+    return {
+        "pending": pending,
+        "oldest_enqueued_at": oldest.isoformat() if oldest else None,
+        "lag_seconds": max(0.0, (datetime.utcnow() - oldest).total_seconds()) if oldest else 0.0,
+        "worker": eligibility_refresher.snapshot(),
+    }
@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from app.metrics import render_metrics
+
+router = APIRouter()
+
+
+# Scraped by Prometheus, aggregated over all workers in multiprocess mode
+@router.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
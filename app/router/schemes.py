@@ -1,13 +1,17 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.crud.applicant_table import get_applicant_by_id
-from app.crud.scheme_table import get_all_schemes, get_eligible_schemes_for_applicant, create_scheme
-from app.db.database import get_db
+from app.crud.scheme_catalog import scheme_catalog, etag_matches
+from app.crud.scheme_table import get_eligible_schemes_for_applicant, create_scheme
+from app.db.database import get_db, get_read_db
 from app.dependecies import get_current_user
 from app.schema.auth_schema import User
+from app.schema.mappers import scheme_to_dict
 from app.schema.scheme_schema import SchemeResponse, SchemeCreate
 
 router = APIRouter()
@@ -20,20 +24,28 @@ router = APIRouter()
     tags=["Schemes"]
 )
 async def create_new_scheme(current_user: Annotated[User, Depends(get_current_user)], scheme: SchemeCreate,
-                            db: Session = Depends(get_db)):
-    return create_scheme(db, scheme)
+                            db: AsyncSession = Depends(get_db)):
+    return ORJSONResponse(scheme_to_dict(await create_scheme(db, scheme)))
 
 
 @router.get(
     "/api/schemes",
     response_model=list[SchemeResponse],
     summary="Get All Schemes",
-    description="This endpoint retrieves all available financial assistance schemes, including their details and eligibility criteria.",
+    description="""
+    This endpoint retrieves all available financial assistance schemes, including their details and eligibility criteria.
+    The response carries an `ETag`, send it back in `If-None-Match` to get a `304 Not Modified` while the catalog is unchanged.
+    """,
     tags=["Schemes"]
 )
-async def read_schemes(db: Session = Depends(get_db)):
-    schemes = get_all_schemes(db)
-    return schemes
+async def read_schemes(request: Request, db: AsyncSession = Depends(get_db)):
+    # Served from the pre-serialized catalog, which skips response validation and usually the database.
+    # The catalog is rebuilt from the primary, a replica could cache a copy without a scheme just created.
+    body, etag = await scheme_catalog.get(db)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @router.get(
@@ -46,10 +58,36 @@ async def read_schemes(db: Session = Depends(get_db)):
     tags=["Schemes"]
 )
 async def read_eligible_schemes(current_user: Annotated[User, Depends(get_current_user)], applicant_id: int,
-                                db: Session = Depends(get_db)):
-    applicant = get_applicant_by_id(db, applicant_id)
+                                db: AsyncSession = Depends(get_read_db)):
+    applicant = await get_applicant_by_id(db, applicant_id)
     if applicant is None:
         raise HTTPException(status_code=404, detail="Applicant not found")
 
-    schemes = get_eligible_schemes_for_applicant(db, applicant)
-    return schemes
+    schemes = await get_eligible_schemes_for_applicant(db, applicant)
+    return ORJSONResponse([scheme_to_dict(scheme) for scheme in schemes])
+
+
+@router.get(
+    "/api/schemes/eligibility-matrix",
+    description="""
+    This endpoint screens every applicant against every scheme in one pass.
+    The result is streamed as newline-delimited JSON, one line per applicant with the IDs of the schemes they are eligible for.
+    """,
+    tags=["Schemes"]
+)
+async def read_eligibility_matrix(current_user: Annotated[User, Depends(get_current_user)],
+                                  chunk_size: int = Query(1000, ge=1, le=10000),
+                                  db: AsyncSession = Depends(get_read_db)):
+    # numpy is only needed here, so it is imported on first use instead of at startup
+    from app.crud.eligibility_matrix import load_eligibility_inputs, iter_eligibility_matrix
+
+    inputs = await load_eligibility_inputs(db)
+
+    def generate():
+        for applicant_ids, eligible in iter_eligibility_matrix(inputs, chunk_size):
+            yield b"".join(
+                orjson.dumps({"applicant_id": applicant_id, "scheme_ids": inputs.scheme_ids[row].tolist()}) + b"\n"
+                for applicant_id, row in zip(applicant_ids.tolist(), eligible)
+            )
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
@@ -1,6 +1,6 @@
 from datetime import date
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
 from app.enums import MaritalStatus, EmploymentStatus, Sex
@@ -9,7 +9,7 @@ from app.enums import MaritalStatus, EmploymentStatus, Sex
 class HouseholdMemberCreate(BaseModel):
     name: str
     ic_number: str
-    date_of_birth: str
+    date_of_birth: date
     sex: Sex
     employment_status: EmploymentStatus
     marital_status: MaritalStatus
@@ -19,7 +19,7 @@ class HouseholdMemberCreate(BaseModel):
 class ApplicantCreate(BaseModel):
     name: str
     ic_number: str
-    date_of_birth: str
+    date_of_birth: date
     sex: Sex
     employment_status: EmploymentStatus
     marital_status: MaritalStatus
@@ -31,12 +31,16 @@ class ApplicantCreate(BaseModel):
 class ApplicantUpdate(BaseModel):
     name: Optional[str] = None
     ic_number: Optional[str] = None
-    date_of_birth: Optional[str] = None
+    date_of_birth: Optional[date] = None
     sex: Optional[Sex] = None
     employment_status: Optional[EmploymentStatus] = None
     marital_status: Optional[MaritalStatus] = None
 
 
+class ApplicantBulkDelete(BaseModel):
+    applicant_ids: List[int] = Field(..., min_length=1, description="The applicants to delete.")
+
+
 class HouseholdMemberResponse(BaseModel):
     id: int
     name: str
@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 from app.enums import ApplicationStatus
 
@@ -15,6 +15,33 @@ class ApplicationUpdate(BaseModel):
     status: Optional[ApplicationStatus] = Field(None, description="Update the status of the application.")
 
 
+class ApplicationFilter(BaseModel):
+    scheme_id: Optional[int] = None
+    applicant_id: Optional[int] = None
+    date_from: Optional[datetime] = Field(None, description="Submitted at or after this time.")
+    date_to: Optional[datetime] = Field(None, description="Submitted at or before this time.")
+
+    @model_validator(mode="after")
+    def check_criteria(self):
+        if self.scheme_id is None and self.applicant_id is None and self.date_from is None and self.date_to is None:
+            raise ValueError("Provide at least one of scheme_id, applicant_id, date_from or date_to")
+        return self
+
+
+class ApplicationBulkStatusUpdate(BaseModel):
+    status: ApplicationStatus = Field(..., description="The status to move the applications to.")
+    application_ids: Optional[List[int]] = Field(None, min_length=1,
+                                                 description="The applications to update, or use filter instead.")
+    filter: Optional[ApplicationFilter] = Field(
+        None, description="Update the applications matching these criteria that can move to the new status.")
+
+    @model_validator(mode="after")
+    def check_selection(self):
+        if (self.application_ids is None) == (self.filter is None):
+            raise ValueError("Provide either application_ids or filter")
+        return self
+
+
 class ApplicationResponse(BaseModel):
     id: int
     applicant_id: int
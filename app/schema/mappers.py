@@ -0,0 +1,53 @@
+# Map ORM rows to the plain dicts described by the response schemas.
+# Routes return these through ORJSONResponse, which skips response_model validation for data that already
+# comes from the database in the right shape.
+from app.db.models import Applicant, Application, Scheme
+
+
+# Matches ApplicantResponse, the applicant's person must be loaded
+def applicant_to_dict(applicant: Applicant) -> dict:
+    person = applicant.person
+    return {
+        "id": applicant.id,
+        "name": person.name,
+        "ic_number": person.ic_number,
+        "date_of_birth": person.date_of_birth,
+        "sex": person.sex.value,
+        "employment_status": person.employment_status.value,
+        "marital_status": person.marital_status.value,
+        "household_id": applicant.household_id
+    }
+
+
+# Matches ApplicationResponse
+def application_to_dict(application: Application) -> dict:
+    return {
+        "id": application.id,
+        "applicant_id": application.applicant_id,
+        "scheme_id": application.scheme_id,
+        "status": application.status.value,
+        "application_date": application.application_date
+    }
+
+
+# Matches SchemeResponse, the scheme's benefits must be loaded
+def scheme_to_dict(scheme: Scheme) -> dict:
+    return {
+        "id": scheme.id,
+        "name": scheme.name,
+        "description": scheme.description,
+        "marital_status_required": scheme.marital_status_required.value if scheme.marital_status_required else None,
+        "employment_status_required": (scheme.employment_status_required.value
+                                       if scheme.employment_status_required else None),
+        "required_relationships": scheme.required_relationships,
+        "household_size": scheme.household_size,
+        "benefits": [
+            {
+                "id": benefit.id,
+                "description": benefit.description,
+                "amount": benefit.amount,
+                "condition": benefit.condition
+            }
+            for benefit in scheme.benefits
+        ]
+    }
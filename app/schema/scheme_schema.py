@@ -1,6 +1,8 @@
 from typing import Optional, List
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+
+from app.enums import EmploymentStatus, MaritalStatus
 
 
 class BenefitCreate(BaseModel):
@@ -12,15 +14,27 @@ class BenefitCreate(BaseModel):
 class SchemeCreate(BaseModel):
     name: str = Field(..., description="The name of the scheme (e.g., 'Family Support Scheme').")
     description: str = Field(..., description="A brief description of the scheme.")
-    marital_status_required: Optional[str] = Field(None,
-                                                   description="Marital status required to be eligible for the scheme.")
-    employment_status_required: Optional[str] = Field(None,
-                                                      description="Employment status required to be eligible for the scheme.")
+    marital_status_required: Optional[MaritalStatus] = Field(
+        None, description="Marital status required to be eligible for the scheme.")
+    employment_status_required: Optional[EmploymentStatus] = Field(
+        None, description="Employment status required to be eligible for the scheme.")
     required_relationships: Optional[List[str]] = Field(None,
                                                         description="List of specific relationships required within the household.")
     household_size: Optional[int] = Field(None, description="Minimum household size required to be eligible.")
     benefits: List[BenefitCreate] = Field(..., description="List of benefits associated with the scheme.")
 
+    # Statuses are accepted by name or value in any case ("single", "SINGLE", "Single")
+    @field_validator("marital_status_required", "employment_status_required", mode="before")
+    @classmethod
+    def parse_status(cls, value, info):
+        if not isinstance(value, str):
+            return value
+        enum_class = MaritalStatus if info.field_name == "marital_status_required" else EmploymentStatus
+        for member in enum_class:
+            if value.lower() in (member.name.lower(), member.value.lower()):
+                return member
+        return value
+
 
 class BenefitResponse(BaseModel):
     id: int
@@ -1,5 +1,10 @@
-from app.config.logging_config import LOGGING_CONFIG
-from app.db.database import engine
+from contextlib import asynccontextmanager
+
+from app.config.logging_config import setup_logging, stop_logging
+from app.db.database import dispose_engine
+from app.eligibility_refresher import eligibility_refresher
+from app.metrics import mark_worker_dead
+from app.middleware import QueryStatsMiddleware, MetricsMiddleware, RequestIdMiddleware
 from fastapi import FastAPI, Request
 from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
@@ -7,17 +12,35 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 from starlette.responses import JSONResponse
 
-from app.db import models
-from app.router import auth, schemes, applicants, applications
-import logging.config
+from app.router import auth, schemes, applicants, applications, internal, health, metrics
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Initialize logging; the database engine is created on first use
+    setup_logging()
+    # The schema is managed by Alembic (alembic upgrade head), workers never run DDL.
+    # The eligibility refresher starts on first use.
+    yield
+    await eligibility_refresher.stop()
+    await dispose_engine()
+    mark_worker_dead()
+    stop_logging()
+
 
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestIdMiddleware)
 # Include routers
 app.include_router(auth.router)
 app.include_router(schemes.router)
 app.include_router(applicants.router)
 app.include_router(applications.router)
+app.include_router(internal.router)
+app.include_router(health.router)
+app.include_router(metrics.router)
 
 
 @app.exception_handler(RequestValidationError)
@@ -50,13 +73,6 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     )
 
 
-# Initialize logging
-logging.config.dictConfig(LOGGING_CONFIG)
-
-# Create the database tables
-models.Base.metadata.create_all(bind=engine)
-
-
 def custom_openapi():
     if app.openapi_schema:
         return app.openapi_schema
@@ -83,7 +99,10 @@ def custom_openapi():
     paths_to_protect = [
         ("POST", "/api/scheme"),
         ("GET", "/api/schemes/eligible"),
+        ("GET", "/api/schemes/eligibility-matrix"),
         ("POST", "/api/applicants"),
+        ("POST", "/api/applicants/import"),
+        ("POST", "/api/applicants/bulk-delete"),
         ("GET", "/api/applicants/{applicant_id}"),
         ("PUT", "/api/applicants/{applicant_id}"),
         ("DELETE", "/api/applicants/{applicant_id}"),
@@ -91,9 +110,15 @@ def custom_openapi():
         ("POST", "/api/applications"),
         ("GET", "/api/applications"),
         ("GET", "/api/applications/search"),
+        ("POST", "/api/applications/bulk-status"),
         ("GET", "/api/applications/{application_id}"),
         ("PUT", "/api/applications/{application_id}"),
         ("DELETE", "/api/applications/{application_id}"),
+        ("GET", "/internal/stats/db-pool"),
+        ("GET", "/internal/stats/read-replicas"),
+        ("GET", "/internal/stats/caches"),
+        ("GET", "/internal/stats/password-hashing"),
+        ("GET", "/internal/stats/eligibility-refresh"),
     ]
 
     for method, path in paths_to_protect:
@@ -107,6 +132,8 @@ def custom_openapi():
         {"name": "Schemes", "description": "Operations related to financial assistance schemes."},
         {"name": "Applicants", "description": "Operations related to applicants."},
         {"name": "Applications", "description": "Operations related to applications for financial assistance."},
+        {"name": "Internal", "description": "Operational statistics for sizing and monitoring the service."},
+        {"name": "Health", "description": "Liveness and readiness probes."},
         ]
     app.openapi_schema = openapi_schema
     return app.openapi_schema
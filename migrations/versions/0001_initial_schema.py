@@ -0,0 +1,132 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Matches the tables previously created by Base.metadata.create_all. Databases that were created that way should be
+stamped with `alembic stamp 0001` before running `alembic upgrade head`.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+MARITAL_STATUS = sa.Enum('SINGLE', 'MARRIED', 'WIDOWED', 'DIVORCED', name='maritalstatus')
+EMPLOYMENT_STATUS = sa.Enum('EMPLOYED', 'UNEMPLOYED', name='employmentstatus')
+SEX = sa.Enum('MALE', 'FEMALE', 'OTHER', name='sex')
+APPLICATION_STATUS = sa.Enum('APPROVED', 'PENDING', 'REJECTED', name='applicationstatus')
+
+
+def upgrade():
+    op.create_table(
+        'administrators',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=50), nullable=False),
+        sa.Column('hashed_password', sa.String(length=100), nullable=False),
+        sa.Column('is_active', sa.Boolean(), server_default=sa.text('1'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('username'),
+    )
+    op.create_index('ix_administrators_id', 'administrators', ['id'])
+
+    op.create_table(
+        'persons',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=50), nullable=True),
+        sa.Column('ic_number', sa.String(length=9), nullable=True),
+        sa.Column('date_of_birth', sa.Date(), nullable=True),
+        sa.Column('sex', SEX, nullable=False),
+        sa.Column('employment_status', EMPLOYMENT_STATUS, nullable=False),
+        sa.Column('marital_status', MARITAL_STATUS, nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('ic_number'),
+    )
+    op.create_index('ix_persons_id', 'persons', ['id'])
+    op.create_index('ix_persons_name', 'persons', ['name'])
+
+    op.create_table(
+        'households',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('address', sa.String(length=100), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_households_id', 'households', ['id'])
+
+    op.create_table(
+        'household_members',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('household_id', sa.Integer(), nullable=True),
+        sa.Column('person_id', sa.Integer(), nullable=True),
+        sa.Column('relation_to_applicant', sa.String(length=20), nullable=True),
+        sa.ForeignKeyConstraint(['household_id'], ['households.id']),
+        sa.ForeignKeyConstraint(['person_id'], ['persons.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_household_members_id', 'household_members', ['id'])
+
+    op.create_table(
+        'schemes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=50), nullable=True),
+        sa.Column('description', sa.String(length=255), nullable=True),
+        sa.Column('marital_status_required', MARITAL_STATUS, nullable=True),
+        sa.Column('employment_status_required', EMPLOYMENT_STATUS, nullable=True),
+        sa.Column('required_relationships', sa.JSON(), nullable=True),
+        sa.Column('household_size', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_schemes_id', 'schemes', ['id'])
+    op.create_index('ix_schemes_name', 'schemes', ['name'])
+
+    op.create_table(
+        'applicants',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('person_id', sa.Integer(), nullable=True),
+        sa.Column('household_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['household_id'], ['households.id']),
+        sa.ForeignKeyConstraint(['person_id'], ['persons.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_applicants_id', 'applicants', ['id'])
+
+    op.create_table(
+        'applications',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('applicant_id', sa.Integer(), nullable=True),
+        sa.Column('scheme_id', sa.Integer(), nullable=True),
+        sa.Column('application_date', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.Column('status', APPLICATION_STATUS, server_default=sa.text("'PENDING'"), nullable=True),
+        sa.ForeignKeyConstraint(['applicant_id'], ['applicants.id']),
+        sa.ForeignKeyConstraint(['scheme_id'], ['schemes.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_applications_id', 'applications', ['id'])
+
+    op.create_table(
+        'benefits',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('scheme_id', sa.Integer(), nullable=True),
+        sa.Column('description', sa.String(length=255), nullable=True),
+        sa.Column('amount', sa.Integer(), nullable=True),
+        sa.Column('condition', sa.String(length=255), nullable=True),
+        sa.ForeignKeyConstraint(['scheme_id'], ['schemes.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_benefits_id', 'benefits', ['id'])
+
+
+def downgrade():
+    op.drop_table('benefits')
+    op.drop_table('applications')
+    op.drop_table('applicants')
+    op.drop_table('schemes')
+    op.drop_table('household_members')
+    op.drop_table('households')
+    op.drop_table('persons')
+    op.drop_table('administrators')
@@ -0,0 +1,28 @@
+"""hot path indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+- applications(applicant_id, scheme_id, status) serves the duplicate pending check in create_new_application, and
+  through its applicant_id prefix also /api/applications/search, so no separate applicant_id index is added.
+- household_members(household_id) serves every household member lookup.
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_applications_applicant_scheme_status', 'applications', ['applicant_id', 'scheme_id', 'status'])
+    op.create_index('ix_household_members_household_id', 'household_members', ['household_id'])
+
+
+def downgrade():
+    op.drop_index('ix_household_members_household_id', table_name='household_members')
+    op.drop_index('ix_applications_applicant_scheme_status', table_name='applications')
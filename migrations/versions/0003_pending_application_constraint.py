@@ -0,0 +1,37 @@
+"""pending application constraint
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+- applications.pending_key is a generated column, 1 while the application is PENDING and NULL otherwise.
+- uq_applications_pending on (applicant_id, scheme_id, pending_key) lets the database reject a second pending
+  application for the same applicant and scheme. It also covers the lookups ix_applications_applicant_scheme_status
+  served, so that index is dropped.
+
+Existing duplicate pending applications must be resolved before upgrading, otherwise the constraint cannot be created.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('applications') as batch_op:
+        batch_op.add_column(
+            sa.Column('pending_key', sa.Integer(), sa.Computed("CASE WHEN status = 'PENDING' THEN 1 END"), nullable=True))
+        batch_op.create_unique_constraint('uq_applications_pending', ['applicant_id', 'scheme_id', 'pending_key'])
+        batch_op.drop_index('ix_applications_applicant_scheme_status')
+
+
+def downgrade():
+    with op.batch_alter_table('applications') as batch_op:
+        batch_op.create_index('ix_applications_applicant_scheme_status', ['applicant_id', 'scheme_id', 'status'])
+        batch_op.drop_constraint('uq_applications_pending', type_='unique')
+        batch_op.drop_column('pending_key')
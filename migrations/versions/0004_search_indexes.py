@@ -0,0 +1,28 @@
+"""search indexes
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+Indexes behind GET /api/applications/search:
+- applicants(person_id) leads from persons matched by name prefix (ix_persons_name) or IC number to their applicants.
+- applications(application_date) serves searches by submission date range.
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_applicants_person_id', 'applicants', ['person_id'])
+    op.create_index('ix_applications_application_date', 'applications', ['application_date'])
+
+
+def downgrade():
+    op.drop_index('ix_applications_application_date', table_name='applications')
+    op.drop_index('ix_applicants_person_id', table_name='applicants')
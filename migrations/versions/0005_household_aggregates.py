@@ -0,0 +1,58 @@
+"""household aggregates
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+- households.member_count and households.relationships (sorted distinct relation_to_applicant values) are kept up
+  to date with household_members, so eligibility checks read the household row instead of its members.
+- Existing households are backfilled here, `python -m scripts.backfill_household_aggregates` repairs them later.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 10000
+
+
+def upgrade():
+    with op.batch_alter_table('households') as batch_op:
+        batch_op.add_column(sa.Column('member_count', sa.Integer(), server_default=sa.text('0'), nullable=False))
+        batch_op.add_column(sa.Column('relationships', sa.JSON(), nullable=True))
+
+    households = sa.table('households', sa.column('id', sa.Integer()), sa.column('member_count', sa.Integer()),
+                          sa.column('relationships', sa.JSON()))
+    members = sa.table('household_members', sa.column('household_id', sa.Integer()),
+                       sa.column('relation_to_applicant', sa.String()))
+    bind = op.get_bind()
+    update = households.update().where(households.c.id == sa.bindparam('household_id')).values(
+        member_count=sa.bindparam('count'), relationships=sa.bindparam('relations'))
+
+    last_id = 0
+    while True:
+        household_ids = bind.execute(sa.select(households.c.id).where(households.c.id > last_id).order_by(
+            households.c.id).limit(BATCH_SIZE)).scalars().all()
+        if not household_ids:
+            break
+        last_id = household_ids[-1]
+        relationships = {household_id: [] for household_id in household_ids}
+        for household_id, relationship in bind.execute(sa.select(members.c.household_id, members.c.relation_to_applicant)
+                                                       .where(members.c.household_id.in_(household_ids))):
+            relationships[household_id].append(relationship)
+        bind.execute(update, [
+            {'household_id': household_id, 'count': len(values),
+             'relations': sorted({value for value in values if value is not None})}
+            for household_id, values in relationships.items()
+        ])
+
+
+def downgrade():
+    with op.batch_alter_table('households') as batch_op:
+        batch_op.drop_column('relationships')
+        batch_op.drop_column('member_count')
@@ -0,0 +1,55 @@
+"""materialized eligibility
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+
+- applicant_scheme_eligibility holds the schemes each applicant is eligible for, read by GET /api/schemes/eligible.
+- eligibility_refresh_queue holds the refreshes still to be applied to it. A full refresh is queued here, the
+  application's refresh task fills the table; until then eligibility is evaluated on read as before.
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'applicant_scheme_eligibility',
+        sa.Column('applicant_id', sa.Integer(), nullable=False),
+        sa.Column('scheme_id', sa.Integer(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['applicant_id'], ['applicants.id']),
+        sa.ForeignKeyConstraint(['scheme_id'], ['schemes.id']),
+        sa.PrimaryKeyConstraint('applicant_id', 'scheme_id'),
+    )
+    op.create_index('ix_applicant_scheme_eligibility_scheme_id', 'applicant_scheme_eligibility', ['scheme_id'])
+
+    queue = op.create_table(
+        'eligibility_refresh_queue',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('applicant_id', sa.Integer(), nullable=True),
+        sa.Column('scheme_id', sa.Integer(), nullable=True),
+        sa.Column('enqueued_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_eligibility_refresh_queue_id', 'eligibility_refresh_queue', ['id'])
+    op.create_index('ix_eligibility_refresh_queue_applicant_id', 'eligibility_refresh_queue', ['applicant_id'])
+
+    op.bulk_insert(queue, [{'applicant_id': None, 'scheme_id': None, 'enqueued_at': datetime.utcnow()}])
+
+
+def downgrade():
+    op.drop_index('ix_eligibility_refresh_queue_applicant_id', table_name='eligibility_refresh_queue')
+    op.drop_index('ix_eligibility_refresh_queue_id', table_name='eligibility_refresh_queue')
+    op.drop_table('eligibility_refresh_queue')
+    op.drop_index('ix_applicant_scheme_eligibility_scheme_id', table_name='applicant_scheme_eligibility')
+    op.drop_table('applicant_scheme_eligibility')
@@ -0,0 +1,24 @@
+"""applicant household index
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+
+- applicants(household_id) finds the households still used by other applicants when applicants are deleted.
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_applicants_household_id', 'applicants', ['household_id'])
+
+
+def downgrade():
+    op.drop_index('ix_applicants_household_id', table_name='applicants')
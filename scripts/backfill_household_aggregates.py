@@ -0,0 +1,43 @@
+# Recompute households.member_count and households.relationships from household_members, for example after
+# members were changed outside the application. Only households whose aggregates are wrong are rewritten.
+#
+# Usage: python -m scripts.backfill_household_aggregates [--batch-size 1000]
+import argparse
+import asyncio
+
+from sqlalchemy import select
+
+from app.crud.household_table import refresh_household_aggregates
+from app.db.database import new_session, dispose_engine
+from app.db.models import Household
+
+
+async def backfill(batch_size: int):
+    checked = repaired = 0
+    last_id = 0
+    try:
+        async with new_session() as db:
+            while True:
+                household_ids = (await db.scalars(
+                    select(Household.id).where(Household.id > last_id).order_by(Household.id).limit(batch_size)
+                )).all()
+                if not household_ids:
+                    break
+                last_id = household_ids[-1]
+                repaired += await refresh_household_aggregates(db, list(household_ids))
+                await db.commit()
+                checked += len(household_ids)
+    finally:
+        await dispose_engine()
+    print("Checked %d households, repaired %d" % (checked, repaired))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute the member aggregates stored on households.")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Households recomputed per transaction.")
+    args = parser.parse_args()
+    asyncio.run(backfill(args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
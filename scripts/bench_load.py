@@ -0,0 +1,327 @@
+# Load test the API and report throughput and latency percentiles per route as JSON.
+#
+# By default the harness migrates a fresh SQLite database, boots uvicorn against it, seeds schemes and applicants
+# from sample_request_data/ and replays a weighted traffic mix with concurrent clients. Point --base-url at a running
+# deployment to skip the boot and reuse its data (seeding still creates an admin, schemes and applicants).
+#
+# Usage: python -m scripts.bench_load [--duration 30] [--concurrency 32] [--output results.json]
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+SAMPLES = ROOT / "sample_request_data"
+# persons.ic_number is VARCHAR(9): "L", a random run prefix, a counter and the person's position in the household
+BASE36 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+# Relative weight of each operation in the traffic mix
+DEFAULT_MIX = {
+    "login": 1,
+    "create_applicant": 10,
+    "eligible_schemes": 25,
+    "create_application": 15,
+    "list_applicants": 15,
+    "list_applications": 15,
+    "list_schemes": 19,
+}
+
+
+def _base36(value: int, width: int) -> str:
+    digits = ""
+    for _ in range(width):
+        value, digit = divmod(value, 36)
+        digits = BASE36[digit] + digits
+    return digits
+
+
+def _load_sample(name: str) -> dict:
+    with open(SAMPLES / name) as f:
+        return json.load(f)
+
+
+# Stored enum names are upper case, the samples use the display casing
+def _scheme_payload(template: dict, index: int, marital: Optional[str], employment: Optional[str]) -> dict:
+    return dict(
+        template,
+        name="%s %d" % (template["name"][:40], index),
+        marital_status_required=marital.upper() if marital else None,
+        employment_status_required=employment.upper() if employment else None,
+    )
+
+
+def _applicant_payload(template: dict, rng: random.Random, serial: str) -> dict:
+    members = [
+        dict(member, ic_number=serial + _base36(position + 1, 1))
+        for position, member in enumerate((template.get("household_members") or [])[:35])
+    ]
+    return dict(
+        template,
+        ic_number=serial + "0",
+        employment_status=rng.choice(["Employed", "Unemployed"]),
+        marital_status=rng.choice(["Single", "Married", "Widowed", "Divorced"]),
+        household_members=members[:rng.randint(0, len(members))],
+    )
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest rank
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+
+    def record(self, route: str, seconds: float, status: str):
+        self.latencies.setdefault(route, []).append(seconds)
+        counts = self.statuses.setdefault(route, {})
+        counts[status] = counts.get(status, 0) + 1
+
+    def report(self, elapsed: float) -> dict:
+        routes = {}
+        for route, values in sorted(self.latencies.items()):
+            values.sort()
+            statuses = self.statuses[route]
+            routes[route] = {
+                "requests": len(values),
+                "throughput_rps": len(values) / elapsed,
+                # Server errors and transport failures, 4xx answers such as ineligible applications are expected
+                "errors": sum(count for status, count in statuses.items()
+                              if not status.isdigit() or status.startswith("5")),
+                "statuses": statuses,
+                "mean_ms": sum(values) / len(values) * 1000,
+                "p50_ms": _percentile(values, 50) * 1000,
+                "p95_ms": _percentile(values, 95) * 1000,
+                "p99_ms": _percentile(values, 99) * 1000,
+                "max_ms": values[-1] * 1000,
+            }
+        total = sum(route["requests"] for route in routes.values())
+        return {
+            "requests": total,
+            "throughput_rps": total / elapsed,
+            "errors": sum(route["errors"] for route in routes.values()),
+            "routes": routes,
+        }
+
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, rng: random.Random, recorder: Recorder, credentials: dict):
+        self.client = client
+        self.rng = rng
+        self.recorder = recorder
+        self.credentials = credentials
+        self.headers: Dict[str, str] = {}
+        self.applicant_template = _load_sample("create_applicant.json")
+        self.applicant_ids: List[int] = []
+        self.scheme_ids: List[int] = []
+        self.serial = 0
+        # Not drawn from rng, so repeated runs with the same seed against one database do not collide
+        self.serial_prefix = _base36(random.SystemRandom().randrange(36 ** 3), 3)
+
+    # 8 characters, the applicant and each household member append one more
+    def _next_serial(self) -> str:
+        self.serial += 1
+        return "L" + self.serial_prefix + _base36(self.serial, 4)
+
+    async def request(self, route: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=self.headers, **kwargs)
+            # Read streamed bodies to the end so the latency covers the whole response
+            await response.aread()
+        except httpx.HTTPError as e:
+            self.recorder.record(route, time.perf_counter() - started, type(e).__name__)
+            return None
+        self.recorder.record(route, time.perf_counter() - started, str(response.status_code))
+        return response
+
+    async def login(self):
+        response = await self.request("POST /auth/login", "POST", "/auth/login", json=self.credentials)
+        if response is not None and response.status_code == 200:
+            self.headers = {"Authorization": "Bearer " + response.json()["access_token"]}
+
+    async def seed(self, schemes: int, applicants: int):
+        await self.client.post("/auth/register", json=self.credentials)
+        await self.login()
+        if not self.headers:
+            raise RuntimeError("Could not log in as the load test administrator")
+
+        template = _load_sample("create_scheme.json")
+        criteria = [(None, None), ("single", None), (None, "unemployed"), ("married", "employed"),
+                    (template["marital_status_required"], template["employment_status_required"])]
+        for index in range(schemes):
+            marital, employment = criteria[index % len(criteria)]
+            response = await self.client.post("/api/scheme", headers=self.headers,
+                                              json=_scheme_payload(template, index, marital, employment))
+            response.raise_for_status()
+            self.scheme_ids.append(response.json()["id"])
+
+        lines = [json.dumps(_applicant_payload(self.applicant_template, self.rng, self._next_serial()))
+                 for _ in range(applicants)]
+        response = await self.client.post("/api/applicants/import", headers=self.headers,
+                                          content="\n".join(lines).encode(), timeout=300)
+        response.raise_for_status()
+        for line in response.text.splitlines():
+            result = json.loads(line)
+            if "id" in result:
+                self.applicant_ids.append(result["id"])
+        if not self.applicant_ids:
+            raise RuntimeError("Seeding created no applicants")
+
+    async def create_applicant(self):
+        payload = _applicant_payload(self.applicant_template, self.rng, self._next_serial())
+        response = await self.request("POST /api/applicants", "POST", "/api/applicants", json=payload)
+        if response is not None and response.status_code == 200:
+            self.applicant_ids.append(response.json()["id"])
+
+    async def eligible_schemes(self):
+        await self.request("GET /api/schemes/eligible", "GET", "/api/schemes/eligible",
+                           params={"applicant_id": self.rng.choice(self.applicant_ids)})
+
+    async def create_application(self):
+        payload = dict(_load_sample("create_application.json"), applicant_id=self.rng.choice(self.applicant_ids),
+                       scheme_id=self.rng.choice(self.scheme_ids))
+        await self.request("POST /api/applications", "POST", "/api/applications", json=payload)
+
+    async def list_applicants(self):
+        await self.request("GET /api/applicants", "GET", "/api/applicants", params={"limit": 100})
+
+    async def list_applications(self):
+        await self.request("GET /api/applications", "GET", "/api/applications", params={"limit": 100})
+
+    async def list_schemes(self):
+        await self.request("GET /api/schemes", "GET", "/api/schemes")
+
+    async def worker(self, mix: Dict[str, int], deadline: float):
+        operations = list(mix)
+        weights = [mix[operation] for operation in operations]
+        while time.perf_counter() < deadline:
+            await getattr(self, self.rng.choices(operations, weights)[0])()
+
+
+def _wait_ready(base_url: str, process: subprocess.Popen, timeout: float):
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError("uvicorn exited with code %s" % process.returncode)
+        try:
+            if httpx.get(base_url + "/health/ready", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    raise RuntimeError("The application did not become ready within %s seconds" % timeout)
+
+
+# Migrate a database and start uvicorn against it, returns the process
+def boot(database_url: str, port: int, workers: int) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_URL=database_url)
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=ROOT, env=env, check=True,
+                   capture_output=True)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers),
+         "--no-access-log"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _wait_ready("http://127.0.0.1:%d" % port, process, timeout=60)
+    return process
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args, base_url: str) -> dict:
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.request_timeout) as client:
+        load_test = LoadTest(client, rng, recorder, {"username": args.username, "password": args.password})
+        await load_test.seed(args.schemes, args.applicants)
+
+        mix = dict(DEFAULT_MIX, **json.loads(args.mix)) if args.mix else DEFAULT_MIX
+        mix = {operation: weight for operation, weight in mix.items() if weight > 0}
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(load_test.worker(mix, deadline) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "commit": _git_commit(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "base_url": base_url,
+        "duration_s": elapsed,
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+        "seeded": {"schemes": args.schemes, "applicants": args.applicants},
+        "mix": mix,
+        **recorder.report(elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a traffic mix against the API and report latency per route.")
+    parser.add_argument("--base-url", help="Test a running deployment instead of booting one.")
+    parser.add_argument("--database-url", help="Database for the booted application, defaults to a temporary SQLite file.")
+    parser.add_argument("--port", type=int, default=8766, help="Port of the booted application.")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers of the booted application.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of traffic after seeding.")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients.")
+    parser.add_argument("--schemes", type=int, default=20, help="Schemes to seed.")
+    parser.add_argument("--applicants", type=int, default=1000, help="Applicants to seed.")
+    parser.add_argument("--mix", help='JSON object overriding operation weights, e.g. \'{"login": 0}\'.')
+    parser.add_argument("--seed", type=int, default=1, help="Random seed of the traffic mix.")
+    parser.add_argument("--request-timeout", type=float, default=30.0, help="Per request timeout in seconds.")
+    parser.add_argument("--username", default="loadtest", help="Administrator created and used for the run.")
+    parser.add_argument("--password", default="loadtest", help="Password of that administrator.")
+    parser.add_argument("--output", help="File to write the JSON report to, defaults to stdout.")
+    args = parser.parse_args()
+
+    process = None
+    database_dir = None
+    base_url = args.base_url
+    try:
+        if base_url is None:
+            database_url = args.database_url
+            if database_url is None:
+                database_dir = tempfile.TemporaryDirectory()
+                database_url = "sqlite+aiosqlite:///" + os.path.join(database_dir.name, "bench.db")
+            process = boot(database_url, args.port, args.workers)
+            base_url = "http://127.0.0.1:%d" % args.port
+        report = asyncio.run(run(args, base_url.rstrip("/")))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if database_dir is not None:
+            database_dir.cleanup()
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        json.dump(report, output, indent=2)
+        output.write("\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# Measure application startup: import time of main (from python -X importtime) and the time until a
+# freshly spawned uvicorn worker answers /health/live and /health/ready. Prints a JSON report.
+#
+# Usage: python -m scripts.bench_startup [--runs 3] [--top 15] [--port 8765]
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+# Import main in a fresh interpreter and return (total import time in ms, slowest modules by cumulative time)
+def measure_imports(top: int):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            capture_output=True, text=True, check=True)
+    modules = []
+    total_us = 0
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, name = int(match.group(1)), int(match.group(2)), match.group(3), match.group(4)
+        modules.append({"module": name, "self_ms": self_us / 1000, "cumulative_ms": cumulative_us / 1000})
+        # Top level imports are printed with a single space of indentation
+        if len(indent) == 1:
+            total_us += cumulative_us
+    modules.sort(key=lambda module: module["cumulative_ms"], reverse=True)
+    return total_us / 1000, modules[:top]
+
+
+def _get(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, ConnectionError, OSError):
+        return 0
+
+
+# Spawn uvicorn and poll the health probes, returning seconds until each answered 200
+def measure_boot(port: int, timeout: float):
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    live = ready = None
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError("uvicorn exited with code %s" % process.returncode)
+            if live is None and _get("http://127.0.0.1:%d/health/live" % port) == 200:
+                live = time.perf_counter() - started
+            if live is not None and _get("http://127.0.0.1:%d/health/ready" % port) == 200:
+                ready = time.perf_counter() - started
+                break
+            time.sleep(0.01)
+    finally:
+        process.terminate()
+        process.wait()
+    return live, ready
+
+
+def _summary(values):
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    return {"min": min(values), "median": statistics.median(values), "max": max(values)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and time to healthy of the application.")
+    parser.add_argument("--runs", type=int, default=3, help="Number of cold starts to measure.")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest imports to report.")
+    parser.add_argument("--port", type=int, default=8765, help="Port the spawned uvicorn listens on.")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds to wait for readiness per run.")
+    args = parser.parse_args()
+
+    import_times = []
+    top_modules = []
+    for _ in range(args.runs):
+        import_ms, top_modules = measure_imports(args.top)
+        import_times.append(import_ms)
+
+    live_times = []
+    ready_times = []
+    for _ in range(args.runs):
+        live, ready = measure_boot(args.port, args.timeout)
+        live_times.append(live)
+        ready_times.append(ready)
+
+    report = {
+        "python": sys.version.split()[0],
+        "database_url_set": bool(os.environ.get("DATABASE_URL")),
+        "runs": args.runs,
+        "import_main_ms": _summary(import_times),
+        "slowest_imports": top_modules,
+        "time_to_live_s": _summary(live_times),
+        "time_to_ready_s": _summary(ready_times),
+    }
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+# Screen every applicant against every scheme and write the result as NDJSON.
+#
+# Usage: python -m scripts.eligibility_matrix [--output eligibility.ndjson] [--chunk-size 1000]
+import argparse
+import asyncio
+import json
+import sys
+
+from app.crud.eligibility_matrix import load_eligibility_inputs, iter_eligible_scheme_ids
+from app.db.database import new_session, dispose_engine
+
+
+async def load_inputs():
+    try:
+        async with new_session() as db:
+            return await load_eligibility_inputs(db)
+    finally:
+        await dispose_engine()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute the applicant x scheme eligibility matrix.")
+    parser.add_argument("--output", help="File to write to, defaults to stdout.")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Applicants evaluated per vectorized step.")
+    args = parser.parse_args()
+
+    inputs = asyncio.run(load_inputs())
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for applicant_id, scheme_ids in iter_eligible_scheme_ids(inputs, args.chunk_size):
+            output.write(json.dumps({"applicant_id": applicant_id, "scheme_ids": scheme_ids}) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()